@@ -0,0 +1,75 @@
+"""
+Device identity.
+
+A physical device (identified by the app's device_id) has at most one active
+FCM token across all users, and a token belongs to exactly one row. When a
+device or token moves to another account its previous rows are retired, so
+the same phone is never pushed twice for one notification.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from notifications import audiences
+from .models import UserDevice
+
+REGISTER_ATTEMPTS = 3
+
+
+def _retire(queryset):
+    """Deactivate the given active devices and resync their owners' audiences"""
+    user_ids = set(queryset.values_list('user_id', flat=True))
+    if user_ids:
+        queryset.update(is_active=False, updated_at=timezone.now())
+        transaction.on_commit(lambda: _sync_audiences(user_ids))
+    return user_ids
+
+
+def _sync_audiences(user_ids):
+    for user_id in user_ids:
+        audiences.sync_user_devices(user_id)
+
+
+def hand_over(device_id, user):
+    """Retire a physical device's active rows that belong to other users"""
+    if not device_id:
+        return set()
+    return _retire(UserDevice.objects.filter(device_id=device_id, is_active=True).exclude(user=user))
+
+
+def register_device(user, fcm_token, device_type='android', device_id=''):
+    """Bind fcm_token and device_id to user as the device's single active row"""
+    for attempt in range(REGISTER_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return _register(user, fcm_token, device_type, device_id)
+        except IntegrityError:
+            # A concurrent registration of the same device or token committed first;
+            # the next attempt sees its row and retires or updates it
+            if attempt == REGISTER_ATTEMPTS - 1:
+                raise
+
+
+def _register(user, fcm_token, device_type, device_id):
+    if device_id:
+        # Older tokens of this device, for this or any other user
+        _retire(UserDevice.objects.filter(device_id=device_id, is_active=True).exclude(fcm_token=fcm_token))
+
+    previous_owner = UserDevice.objects.filter(fcm_token=fcm_token).exclude(user=user).values_list(
+        'user_id', flat=True
+    ).first()
+
+    device, created = UserDevice.objects.update_or_create(
+        fcm_token=fcm_token,
+        defaults={
+            'user': user,
+            'device_type': device_type,
+            'device_id': device_id,
+            'is_active': True,
+        }
+    )
+
+    if previous_owner is not None:
+        # The token changed hands; the save signal only resyncs the new owner
+        transaction.on_commit(lambda: _sync_audiences([previous_owner]))
+    return device
+
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with costs from settings. Django's defaults (100 MiB per hash,
+    8 lanes) make each login hold a lot of memory during login spikes;
+    hashes with other parameters are upgraded on the user's next login.
+    """
+    time_cost = settings.ARGON2_TIME_COST
+    memory_cost = settings.ARGON2_MEMORY_COST
+    parallelism = settings.ARGON2_PARALLELISM
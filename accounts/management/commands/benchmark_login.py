@@ -0,0 +1,46 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import check_password, get_hashers, make_password
+from django.core.management.base import BaseCommand, CommandError
+
+PASSWORD = 'benchmark-password-123'
+
+
+class Command(BaseCommand):
+    help = 'Measure password verification throughput (the CPU cost of a login) per configured hasher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashers', nargs='+',
+                            help='Hasher algorithms to compare (default: every configured hasher)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Logins verified in parallel')
+        parser.add_argument('--logins', type=int, default=200, help='Logins verified per hasher')
+
+    def handle(self, *args, **options):
+        algorithms = options['hashers'] or [hasher.algorithm for hasher in get_hashers()]
+        concurrency = options['concurrency']
+
+        self.stdout.write(f"{options['logins']} logins per hasher, {concurrency} in parallel")
+        self.stdout.write(f"{'hasher':<16}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for algorithm in algorithms:
+            try:
+                encoded = make_password(PASSWORD, hasher=algorithm)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+            def login(_):
+                started = time.perf_counter()
+                if not check_password(PASSWORD, encoded):
+                    raise CommandError(f'{algorithm} failed to verify its own hash')
+                return (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                latencies = sorted(executor.map(login, range(options['logins'])))
+            elapsed = time.perf_counter() - started
+
+            quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+            self.stdout.write(
+                f'{algorithm:<16}{len(latencies) / elapsed:>10.0f}{quantiles[49]:>10.1f}{quantiles[94]:>10.1f}'
+            )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from accounts.models import User
+from accounts.tasks import generate_profile_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Queue thumbnail rendering for profile pictures that have no thumbnail yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Re-render every thumbnail, e.g. after changing PROFILE_THUMBNAIL_SIZE')
+
+    def handle(self, *args, **options):
+        users = User.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        if not options['all']:
+            users = users.filter(Q(profile_thumbnail='') | Q(profile_thumbnail__isnull=True))
+
+        queued = 0
+        for user_id, picture_name in users.values_list('id', 'profile_picture').iterator():
+            generate_profile_thumbnail.delay(user_id, picture_name)
+            queued += 1
+        self.stdout.write(self.style.SUCCESS(f'Queued {queued} thumbnails'))
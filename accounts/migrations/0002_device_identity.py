@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:28
+
+from django.db import migrations, models
+
+
+def collapse_duplicate_devices(apps, schema_editor):
+    """Keep only the most recently updated active row for each physical device"""
+    UserDevice = apps.get_model('accounts', 'UserDevice')
+    duplicated = UserDevice.objects.filter(is_active=True).exclude(device_id='').values(
+        'device_id'
+    ).annotate(rows=models.Count('id')).filter(rows__gt=1).values_list('device_id', flat=True)
+
+    for device_id in list(duplicated):
+        rows = UserDevice.objects.filter(device_id=device_id, is_active=True).order_by('-updated_at', '-id')
+        keep = rows.values_list('id', flat=True).first()
+        rows.exclude(id=keep).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(collapse_duplicate_devices, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='userdevice',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='userdevice',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True), models.Q(('device_id', ''), _negated=True)), fields=('device_id',), name='unique_active_device_id'),
+        ),
+    ]
@@ -30,6 +30,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     first_name = models.CharField(max_length=30, blank=True)
     last_name = models.CharField(max_length=30, blank=True)
     profile_picture = models.ImageField(upload_to='profile_pictures/', null=True, blank=True)
+    # Small WebP variant of profile_picture, generated in the background (see accounts/thumbnails.py)
+    profile_thumbnail = models.ImageField(upload_to='profile_thumbnails/', null=True, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     date_joined = models.DateTimeField(default=timezone.now)
@@ -67,7 +69,14 @@ class UserDevice(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
-        unique_together = ('user', 'device_id')
+        constraints = [
+            # One active token per physical device, across all users
+            models.UniqueConstraint(
+                fields=['device_id'],
+                condition=models.Q(is_active=True) & ~models.Q(device_id=''),
+                name='unique_active_device_id'
+            ),
+        ]
         
     def __str__(self):
         return f"{self.user.phone_number} - {self.device_type}"
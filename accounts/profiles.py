@@ -0,0 +1,39 @@
+"""
+Cached UserSummarySerializer output for authors embedded in cached posts and
+comments. An entry is dropped whenever one of its fields is saved.
+"""
+from notification_backend import cache
+from .models import User
+from .serializers import UserSummarySerializer
+
+PROFILE_FIELDS = set(UserSummarySerializer.Meta.fields)
+
+
+def _key(user_id):
+    return f'accounts:summary:v2:{user_id}'
+
+
+def store(profiles):
+    """Cache {user_id: profile data}"""
+    cache.set_many({_key(user_id): dict(data) for user_id, data in profiles.items()})
+
+
+def get_profiles(user_ids, request=None):
+    """Return {user_id: profile data}, serializing and caching the ones not cached yet"""
+    user_ids = set(user_ids)
+    cached = cache.get_many([_key(user_id) for user_id in user_ids])
+    profiles = {user_id: cached[_key(user_id)] for user_id in user_ids if _key(user_id) in cached}
+
+    missing = user_ids - profiles.keys()
+    if missing:
+        fresh = {
+            user.id: UserSummarySerializer(user, context={'request': request}).data
+            for user in User.objects.filter(id__in=missing)
+        }
+        store(fresh)
+        profiles.update(fresh)
+    return profiles
+
+
+def invalidate(user_id):
+    cache.delete_many([_key(user_id)])
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import authenticate
+from notifications import audiences
+from . import devices
 from .models import User, UserDevice
 
 
@@ -48,33 +50,44 @@ class UserDeviceSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserDevice
         fields = ('fcm_token', 'device_type', 'device_id')
+        # Re-registering a known token or device hands it over instead of failing validation
+        extra_kwargs = {
+            'fcm_token': {'validators': []},
+            'device_id': {'validators': []},
+        }
+        validators = []
     
     def create(self, validated_data):
         user = self.context['request'].user
-        # Deactivate old tokens for the same device
-        UserDevice.objects.filter(
-            user=user,
-            device_id=validated_data.get('device_id', '')
-        ).update(is_active=False)
-        
-        device, created = UserDevice.objects.update_or_create(
-            user=user,
-            fcm_token=validated_data['fcm_token'],
-            defaults=validated_data
-        )
-        return device
+        return devices.register_device(user, **validated_data)
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ('id', 'phone_number', 'first_name', 'last_name', 'profile_picture', 'date_joined')
-        read_only_fields = ('id', 'phone_number', 'date_joined')
+        fields = (
+            'id', 'phone_number', 'first_name', 'last_name', 'profile_picture', 'profile_thumbnail', 'date_joined'
+        )
+        read_only_fields = ('id', 'phone_number', 'profile_thumbnail', 'date_joined')
+
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    """
+    User embedded in posts, comments and notifications. profile_thumbnail is empty
+    until the thumbnail has been rendered, so clients fall back to profile_picture.
+    """
+    class Meta:
+        model = User
+        fields = (
+            'id', 'phone_number', 'first_name', 'last_name', 'profile_picture', 'profile_thumbnail', 'date_joined'
+        )
+        read_only_fields = fields
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     phone_number = serializers.CharField()
     password = serializers.CharField(write_only=True)
+    device_id = serializers.CharField(write_only=True, required=False, allow_blank=True)
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -100,6 +113,11 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         if not user.is_active:
             raise serializers.ValidationError('User account is disabled.')
         
+        audiences.touch_user(user.id)
+        
+        # Stop pushing the previous account on this phone as soon as someone else logs in
+        devices.hand_over(attrs.get('device_id'), user)
+        
         # Get tokens
         refresh = self.get_token(user)
         
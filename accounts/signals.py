@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from . import profiles
+from .models import User
+from .tasks import generate_profile_thumbnail
+
+
+def _picture_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+@receiver(post_init, sender=User)
+def remember_profile_picture(sender, instance, **kwargs):
+    # Deferred (e.g. .only()) when missing; pre_save then reads it from the database
+    if 'profile_picture' in instance.__dict__:
+        instance._loaded_profile_picture = _picture_name(instance.__dict__['profile_picture'])
+
+
+@receiver(pre_save, sender=User)
+def track_profile_picture_change(sender, instance, update_fields=None, **kwargs):
+    instance._profile_picture_changed = False
+    if update_fields is not None and 'profile_picture' not in update_fields:
+        return
+    if instance._state.adding:
+        previous = ''
+    elif hasattr(instance, '_loaded_profile_picture'):
+        previous = instance._loaded_profile_picture
+    else:
+        previous = User.objects.filter(pk=instance.pk).values_list('profile_picture', flat=True).first() or ''
+    if previous != _picture_name(instance.profile_picture):
+        instance._profile_picture_changed = True
+        # Stale until the new thumbnail is rendered
+        instance.profile_thumbnail = None
+
+
+@receiver(post_save, sender=User)
+def queue_profile_thumbnail(sender, instance, update_fields=None, **kwargs):
+    if instance._profile_picture_changed and instance.profile_picture:
+        picture_name = instance.profile_picture.name
+        transaction.on_commit(lambda: generate_profile_thumbnail.delay(instance.id, picture_name))
+    if update_fields is None or 'profile_picture' in update_fields:
+        instance._loaded_profile_picture = _picture_name(instance.profile_picture)
+
+
+@receiver(post_save, sender=User)
+def invalidate_profile_on_save(sender, instance, update_fields=None, **kwargs):
+    # Logins and password changes don't touch the cached profile
+    if update_fields is not None and not profiles.PROFILE_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(lambda: profiles.invalidate(instance.id))
+
+
+@receiver(post_delete, sender=User)
+def invalidate_profile_on_delete(sender, instance, **kwargs):
+    # Deleted instances lose their pk, so bind it now
+    user_id = instance.id
+    transaction.on_commit(lambda: profiles.invalidate(user_id))
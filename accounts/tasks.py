@@ -0,0 +1,24 @@
+from celery import shared_task
+from . import profiles, thumbnails
+from .models import User
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def generate_profile_thumbnail(user_id, picture_name):
+    """Render the thumbnail of a user's profile picture, unless it has been replaced since"""
+    user = User.objects.filter(id=user_id, profile_picture=picture_name).only('id', 'profile_picture').first()
+    if user is None:
+        logger.info(f"Profile picture of user {user_id} changed before its thumbnail was rendered")
+        return None
+
+    name = thumbnails.render(user.profile_picture)
+    if name is None:
+        return None
+
+    # update() avoids re-running the save signals; cached profiles are dropped explicitly
+    User.objects.filter(id=user_id, profile_picture=picture_name).update(profile_thumbnail=name)
+    profiles.invalidate(user_id)
+    return name
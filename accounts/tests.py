@@ -1 +1,124 @@
-# accounts/tests.py
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+
+from . import devices
+from .models import User, UserDevice
+
+
+class RegisterDeviceTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(phone_number='+15550200001', password='password')
+        self.bob = User.objects.create_user(phone_number='+15550200002', password='password')
+
+    def test_new_token_of_a_device_retires_the_old_one(self):
+        old = devices.register_device(self.alice, 'token-1', device_id='phone-1')
+        new = devices.register_device(self.alice, 'token-2', device_id='phone-1')
+
+        old.refresh_from_db()
+        self.assertFalse(old.is_active)
+        self.assertTrue(new.is_active)
+
+    def test_device_moving_to_another_user_is_handed_over(self):
+        alices = devices.register_device(self.alice, 'token-1', device_id='phone-1')
+        bobs = devices.register_device(self.bob, 'token-2', device_id='phone-1')
+
+        alices.refresh_from_db()
+        self.assertFalse(alices.is_active)
+        self.assertEqual((bobs.user, bobs.is_active), (self.bob, True))
+        self.assertEqual(UserDevice.objects.filter(device_id='phone-1', is_active=True).count(), 1)
+
+    def test_reregistering_a_token_moves_its_row_to_the_new_user(self):
+        first = devices.register_device(self.alice, 'token-1', device_id='phone-1')
+        devices.register_device(self.alice, 'token-2', device_id='phone-2')
+
+        second = devices.register_device(self.bob, 'token-1', device_type='ios', device_id='phone-1')
+
+        self.assertEqual(second.id, first.id)
+        self.assertEqual((second.user, second.device_type, second.is_active), (self.bob, 'ios', True))
+        self.assertEqual(UserDevice.objects.filter(fcm_token='token-1').count(), 1)
+        # Alice's other device is untouched
+        self.assertTrue(UserDevice.objects.get(fcm_token='token-2').is_active)
+
+    def test_reregistering_a_retired_token_reactivates_it(self):
+        first = devices.register_device(self.alice, 'token-1', device_id='phone-1')
+        devices.register_device(self.bob, 'token-2', device_id='phone-1')
+
+        again = devices.register_device(self.alice, 'token-1', device_id='phone-1')
+
+        self.assertEqual(again.id, first.id)
+        self.assertTrue(again.is_active)
+        self.assertFalse(UserDevice.objects.get(fcm_token='token-2').is_active)
+
+    def test_hand_over_retires_other_users_rows_only(self):
+        alices = devices.register_device(self.alice, 'token-1', device_id='phone-1')
+
+        self.assertEqual(devices.hand_over('phone-1', self.alice), set())
+        self.assertEqual(devices.hand_over('phone-1', self.bob), {self.alice.id})
+        alices.refresh_from_db()
+        self.assertFalse(alices.is_active)
+
+    def test_devices_without_device_id_are_independent(self):
+        devices.register_device(self.alice, 'token-1')
+        devices.register_device(self.bob, 'token-2')
+
+        self.assertEqual(UserDevice.objects.filter(device_id='', is_active=True).count(), 2)
+
+
+class UniqueActiveDeviceIdTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+15550200003', password='password')
+
+    def _device(self, fcm_token, **kwargs):
+        return UserDevice.objects.create(user=self.user, fcm_token=fcm_token, **kwargs)
+
+    def test_two_active_rows_for_one_device_are_rejected(self):
+        self._device('token-1', device_id='phone-1')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self._device('token-2', device_id='phone-1')
+
+    def test_inactive_rows_and_blank_device_ids_are_not_constrained(self):
+        self._device('token-1', device_id='phone-1')
+        self._device('token-2', device_id='phone-1', is_active=False)
+        self._device('token-3', device_id='')
+        self._device('token-4', device_id='')
+
+        self.assertEqual(UserDevice.objects.count(), 4)
+
+
+class CollapseDuplicateDevicesMigrationTests(TransactionTestCase):
+    before = [('accounts', '0001_initial')]
+    after = [('accounts', '0002_device_identity')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_only_the_latest_active_row_of_a_device_survives(self):
+        apps = self._migrate(self.before)
+        HistoricalUser = apps.get_model('accounts', 'User')
+        HistoricalDevice = apps.get_model('accounts', 'UserDevice')
+        alice = HistoricalUser.objects.create(phone_number='+15550200004')
+        bob = HistoricalUser.objects.create(phone_number='+15550200005')
+        older = HistoricalDevice.objects.create(user=alice, fcm_token='token-1', device_id='phone-1')
+        latest = HistoricalDevice.objects.create(user=bob, fcm_token='token-2', device_id='phone-1')
+        retired = HistoricalDevice.objects.create(user=alice, fcm_token='token-3', device_id='phone-2', is_active=False)
+        other = HistoricalDevice.objects.create(user=bob, fcm_token='token-4', device_id='phone-2')
+        blank = [
+            HistoricalDevice.objects.create(user=user, fcm_token=f'token-blank-{user.id}', device_id='')
+            for user in (alice, bob)
+        ]
+
+        self._migrate(self.after)
+
+        active = set(UserDevice.objects.filter(is_active=True).values_list('id', flat=True))
+        self.assertEqual(active, {latest.id, other.id, *(device.id for device in blank)})
+        self.assertNotIn(older.id, active)
+        self.assertNotIn(retired.id, active)
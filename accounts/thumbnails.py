@@ -0,0 +1,42 @@
+"""
+Profile picture thumbnails.
+
+Pictures are shown as small avatars in posts, comments and notifications,
+so a WebP variant of at most PROFILE_THUMBNAIL_SIZE pixels is rendered in a
+Celery task after each upload. Files are named after a hash of their
+content: identical thumbnails are stored once and the URLs can be cached
+indefinitely. Because files may be shared, they are never deleted.
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+_field = User._meta.get_field('profile_thumbnail')
+
+
+def render(picture):
+    """Store a WebP thumbnail of an uploaded picture and return its name, or None if unreadable"""
+    try:
+        with picture.open('rb'), Image.open(picture) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((settings.PROFILE_THUMBNAIL_SIZE, settings.PROFILE_THUMBNAIL_SIZE), Image.LANCZOS)
+            image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+            buffer = BytesIO()
+            image.save(buffer, 'WEBP', quality=settings.PROFILE_THUMBNAIL_QUALITY, method=4)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        logger.warning(f"Could not create thumbnail for {picture.name}: {e}")
+        return None
+
+    content = buffer.getvalue()
+    name = f'{_field.upload_to}{hashlib.sha256(content).hexdigest()[:32]}.webp'
+    if not _field.storage.exists(name):
+        name = _field.storage.save(name, ContentFile(content))
+    return name
@@ -1,8 +1,10 @@
+from django.utils import timezone
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework_simplejwt.views import TokenObtainPairView
 from drf_spectacular.utils import extend_schema
+from notifications import audiences
 from .models import User, UserDevice
 from .serializers import (
     UserRegistrationSerializer,
@@ -83,5 +85,6 @@ def logout_view(request):
     """
     Logout user by deactivating all their devices
     """
-    UserDevice.objects.filter(user=request.user).update(is_active=False)
+    UserDevice.objects.filter(user=request.user, is_active=True).update(is_active=False, updated_at=timezone.now())
+    audiences.sync_user_devices(request.user.id)
     return Response({"message": "Successfully logged out"}, status=status.HTTP_200_OK)
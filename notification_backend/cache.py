@@ -0,0 +1,77 @@
+"""
+Django cache on Redis (settings.CACHES) and fail-open helpers for the
+response caches built on it.
+
+Cached values are pickled and zlib-compressed above COMPRESS_MIN_BYTES;
+serialized API responses are repetitive JSON-like dicts and shrink several
+times, which keeps Redis memory and network transfer down.
+"""
+import logging
+import zlib
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisSerializer
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_MIN_BYTES = 512
+COMPRESS_LEVEL = 6
+
+# Compressed payloads are marked with a prefix pickles and plain ints never start with
+_COMPRESSED = b'z'
+
+
+class CompressedSerializer(RedisSerializer):
+    """RedisSerializer that zlib-compresses large pickles (ints stay raw for incr/decr)"""
+
+    def dumps(self, obj):
+        data = super().dumps(obj)
+        if isinstance(data, bytes) and len(data) >= COMPRESS_MIN_BYTES:
+            return _COMPRESSED + zlib.compress(data, COMPRESS_LEVEL)
+        return data
+
+    def loads(self, data):
+        if data[:1] == _COMPRESSED:
+            data = zlib.decompress(data[1:])
+        return super().loads(data)
+
+
+def get_many(keys):
+    """cache.get_many() that returns {} when response caching is off or Redis is down"""
+    if not settings.RESPONSE_CACHE_ENABLED or not keys:
+        return {}
+    try:
+        return cache.get_many(keys)
+    except redis.RedisError as e:
+        logger.warning(f"Cache read failed: {e}")
+        return {}
+
+
+def set_many(values):
+    if not settings.RESPONSE_CACHE_ENABLED or not values:
+        return
+    try:
+        cache.set_many(values, settings.RESPONSE_CACHE_TTL)
+    except redis.RedisError as e:
+        logger.warning(f"Cache write failed: {e}")
+
+
+def get_or_set(key, default):
+    """cache.get_or_set(), or None when response caching is off or Redis is down"""
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    try:
+        return cache.get_or_set(key, default, settings.RESPONSE_CACHE_TTL)
+    except redis.RedisError as e:
+        logger.warning(f"Cache read failed: {e}")
+        return None
+
+
+def delete_many(keys):
+    """Invalidate even while caching is disabled so re-enabling it can't serve stale entries"""
+    try:
+        cache.delete_many(keys)
+    except redis.RedisError as e:
+        logger.warning(f"Cache invalidation failed: {e}")
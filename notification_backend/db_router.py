@@ -0,0 +1,181 @@
+import logging
+import random
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Models whose rows live on the recipient's notification shard when sharding is enabled
+SHARDED_MODELS = {'notifications.notification', 'notifications.notificationdelivery'}
+
+# Set while a view serves a read-only request that may be answered by a replica
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def _pin_key(user_id):
+    return f'db:pin-primary:{user_id}'
+
+
+def pin_to_primary(user):
+    """
+    Send this user's reads to the primary until replicas have caught up with their
+    write. The pin lives in Redis so every web process and worker sees it.
+    """
+    if settings.DATABASE_REPLICAS and user.is_authenticated:
+        try:
+            get_redis().set(_pin_key(user.pk), 1, ex=settings.DATABASE_REPLICA_PIN_SECONDS)
+        except redis.RedisError as e:
+            logger.warning(f"Could not pin user {user.pk} to the primary: {e}")
+
+
+def is_pinned_to_primary(user):
+    if not user.is_authenticated:
+        return False
+    try:
+        return bool(get_redis().exists(_pin_key(user.pk)))
+    except redis.RedisError:
+        # Without the pin record, play safe and read from the primary
+        return True
+
+
+def _replicas_allowed(user):
+    return bool(settings.DATABASE_REPLICAS) and not is_pinned_to_primary(user)
+
+
+@contextmanager
+def _allow_replicas(allowed):
+    token = _replica_reads.set(allowed)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def replica_reads(user):
+    """Allow reads inside the block to go to a replica unless the user just wrote"""
+    with _allow_replicas(_replicas_allowed(user)):
+        yield
+
+
+@asynccontextmanager
+async def areplica_reads(user):
+    """replica_reads() for async views; the pin lookup runs off the event loop"""
+    with _allow_replicas(await sync_to_async(_replicas_allowed)(user)):
+        yield
+
+
+def use_read_replica(view_func):
+    """Decorator for read-only function views (apply below @api_view)"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(request.user):
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaMixin:
+    """Serve list() from a replica; the response data is built inside the block"""
+
+    def list(self, request, *args, **kwargs):
+        with replica_reads(request.user):
+            return super().list(request, *args, **kwargs)
+
+
+class ReadReplicaRouter:
+    """
+    Route reads to a random replica only inside replica_reads(); everything
+    else (writes, Celery tasks, admin) uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def shard_for(recipient_id):
+    """Database alias holding a recipient's notifications, or None when sharding is off"""
+    if not settings.NOTIFICATION_SHARDS:
+        return None
+    return settings.NOTIFICATION_SHARDS[recipient_id % len(settings.NOTIFICATION_SHARDS)]
+
+
+def notification_databases():
+    """Every database holding notifications; [None] (router's choice) when sharding is off"""
+    return settings.NOTIFICATION_SHARDS or [None]
+
+
+def group_by_shard(items, recipient_id):
+    """Split items into {alias: [items]} using recipient_id(item)"""
+    groups = {}
+    for item in items:
+        groups.setdefault(shard_for(recipient_id(item)), []).append(item)
+    return groups
+
+
+class NotificationShardRouter:
+    """
+    Place Notification and NotificationDelivery rows on the shard of their
+    recipient. Querysets are routed explicitly with
+    Notification.objects.for_recipient() or .using(); this router covers
+    saves of model instances and access through related managers.
+
+    Shards are migrated with the notification tables only, through the
+    shard-hinted operations of notifications/migrations/_shards.py; the primary
+    keeps the full schema, notification tables and their constraints included.
+    """
+
+    def _db_for_instance(self, model, hints):
+        if not settings.NOTIFICATION_SHARDS or model._meta.label_lower not in SHARDED_MODELS:
+            return None
+        instance = hints.get('instance')
+        if instance is None or instance._meta.label_lower not in SHARDED_MODELS:
+            return None
+        if not instance._state.adding:
+            return instance._state.db
+
+        recipient_id = getattr(instance, 'recipient_id', None)
+        if recipient_id is None:
+            # A delivery lives next to its notification
+            notification = instance._state.fields_cache.get('notification')
+            if notification is not None:
+                return notification._state.db or shard_for(notification.recipient_id)
+            return None
+        return shard_for(recipient_id)
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_instance(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_instance(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Sharded rows reference users, posts and devices on the primary
+        if settings.NOTIFICATION_SHARDS and SHARDED_MODELS & {obj1._meta.label_lower, obj2._meta.label_lower}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db not in settings.NOTIFICATION_SHARDS:
+            return None
+        return app_label == 'notifications' and hints.get('shard', False)
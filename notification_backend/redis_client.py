@@ -0,0 +1,17 @@
+import redis
+from django.conf import settings
+
+_client = None
+
+
+def get_redis():
+    """Shared Redis client for app data (feed, counters, queues); pooled per process"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=1,
+            socket_timeout=1,
+            health_check_interval=30
+        )
+    return _client
@@ -10,14 +10,15 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 from datetime import timedelta
+from celery.schedules import crontab
 
 # Try to use pysqlite3 if available
 try:
     import pysqlite3
-    import sys
     sys.modules['sqlite3'] = pysqlite3
 except ImportError:
     pass
@@ -102,6 +103,66 @@ DATABASES = {
     }
 }
 
+# SQLite performance mode (opt-in): WAL journaling lets readers run alongside
+# a writer, and IMMEDIATE transactions plus a busy timeout make concurrent
+# Celery workers and API processes wait for the write lock instead of failing
+# with "database is locked".
+SQLITE_PERFORMANCE_MODE = config('SQLITE_PERFORMANCE_MODE', default=False, cast=bool)
+
+if SQLITE_PERFORMANCE_MODE:
+    SQLITE_BUSY_TIMEOUT = config('SQLITE_BUSY_TIMEOUT', default=20, cast=int)  # seconds
+    SQLITE_MMAP_SIZE = config('SQLITE_MMAP_SIZE', default=268435456, cast=int)  # bytes
+    SQLITE_CACHE_SIZE = config('SQLITE_CACHE_SIZE', default=65536, cast=int)  # KiB
+
+    DATABASES['default']['OPTIONS'] = {
+        'timeout': SQLITE_BUSY_TIMEOUT,
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT * 1000};'
+            f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};'
+            f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE};'
+            'PRAGMA temp_store=MEMORY;'
+        ),
+    }
+
+# Read replicas: comma-separated hosts that share the primary's credentials.
+# List/count endpoints read from a random replica; a user's reads stick to the
+# primary for DATABASE_REPLICA_PIN_SECONDS after they write.
+DATABASE_REPLICAS = []
+for index, host in enumerate(config('DATABASE_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_REPLICA_PIN_SECONDS = config('DATABASE_REPLICA_PIN_SECONDS', default=5, cast=int)
+
+# Notification sharding (opt-in): comma-separated hosts that share the primary's
+# credentials. Notification and NotificationDelivery rows are placed on
+# shard recipient_id % len(hosts); everything else stays on the primary.
+NOTIFICATION_SHARDS = []
+for index, host in enumerate(config('NOTIFICATION_SHARD_HOSTS', default='', cast=Csv())):
+    alias = f'notifications_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host}
+    NOTIFICATION_SHARDS.append(alias)
+
+DATABASE_ROUTERS = [
+    'notification_backend.db_router.NotificationShardRouter',
+    'notification_backend.db_router.ReadReplicaRouter',
+]
+
+# Number of rows written per INSERT when fanning out notifications
+NOTIFICATION_BULK_BATCH_SIZE = config('NOTIFICATION_BULK_BATCH_SIZE', default=500, cast=int)
+
+# (notification, recipient) pairs handled by one send_notifications_batch task
+NOTIFICATION_DELIVERY_BATCH_SIZE = config('NOTIFICATION_DELIVERY_BATCH_SIZE', default=500, cast=int)
+
+# Notification audiences: users active within this many days form the 'recent' audience
+AUDIENCE_RECENT_DAYS = config('AUDIENCE_RECENT_DAYS', default=30, cast=int)
+# How long an audience size counted from the database is reused before the sets are built
+AUDIENCE_SIZE_CACHE_SECONDS = config('AUDIENCE_SIZE_CACHE_SECONDS', default=300, cast=int)
+
 # For production, you can use PostgreSQL:
 # DATABASES = {
 #     'default': {
@@ -134,6 +195,22 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Argon2id for new and rehashed passwords; PBKDF2 hashes still verify and are upgraded on login.
+# The defaults follow OWASP's minimum (19 MiB, 2 passes, 1 lane) to keep login spikes cheap.
+PASSWORD_HASHERS = [
+    'accounts.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+ARGON2_TIME_COST = config('ARGON2_TIME_COST', default=2, cast=int)
+ARGON2_MEMORY_COST = config('ARGON2_MEMORY_COST', default=19456, cast=int)  # KiB
+ARGON2_PARALLELISM = config('ARGON2_PARALLELISM', default=1, cast=int)
+
+# Cheap hashing for the test suite and throwaway data (never in production)
+if config('FAST_PASSWORD_HASHER', default='test' in sys.argv[1:2], cast=bool):
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher', *PASSWORD_HASHERS]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -170,8 +247,16 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # Sliding-window limits on endpoints that fan out notifications (posts/throttles.py)
+    'DEFAULT_THROTTLE_RATES': {
+        'post_create': config('THROTTLE_POST_CREATE', default='10/hour'),
+        'comment_create': config('THROTTLE_COMMENT_CREATE', default='30/min'),
+    },
 }
 
+# Notification recipients a single user may fan out to per hour
+NOTIFICATION_FANOUT_BUDGET = config('NOTIFICATION_FANOUT_BUDGET', default=100000, cast=int)
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=config('JWT_ACCESS_TOKEN_LIFETIME', default=60, cast=int)),
@@ -198,17 +283,97 @@ CORS_ALLOWED_ORIGINS = [
 # Firebase Configuration
 FIREBASE_CREDENTIALS_PATH = config('FIREBASE_CREDENTIALS_PATH', default='')
 
+# Redis Configuration
+REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
+
+# Django cache on Redis: pooled connections, zlib-compressed values
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_URL', default=REDIS_URL),
+        'KEY_PREFIX': 'cache',
+        'OPTIONS': {
+            'serializer': 'notification_backend.cache.CompressedSerializer',
+            'max_connections': config('CACHE_MAX_CONNECTIONS', default=50, cast=int),
+            'socket_connect_timeout': 1,
+            'socket_timeout': 1,
+            'health_check_interval': 30,
+        },
+    }
+}
+
 # Celery Configuration
-CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
-CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://localhost:6379/0')
-CELERY_ACCEPT_CONTENT = ['json']
-CELERY_TASK_SERIALIZER = 'json'
-CELERY_RESULT_SERIALIZER = 'json'
+CELERY_BROKER_URL = REDIS_URL
+# No caller reads task results, so there is no result backend and results aren't stored
+CELERY_TASK_IGNORE_RESULT = True
+# msgpack messages are smaller and faster to (de)serialize; json is still accepted during rollouts
+CELERY_ACCEPT_CONTENT = ['msgpack', 'json']
+CELERY_TASK_SERIALIZER = 'msgpack'
 CELERY_TIMEZONE = 'UTC'
+# Notification tasks are long I/O waits: reserve one message per worker slot at a time
+CELERY_WORKER_PREFETCH_MULTIPLIER = config('CELERY_WORKER_PREFETCH_MULTIPLIER', default=1, cast=int)
+# Unacknowledged messages (acks_late tasks, ETA tasks held by a worker) are redelivered after this,
+# so it must exceed the longest task ETA; deferred pushes wait in the scheduler, not in ETA tasks
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'visibility_timeout': config('CELERY_VISIBILITY_TIMEOUT', default=43200, cast=int),  # seconds
+}
+
+# Deferred notifications wait in a Redis sorted set and are released by beat:
+#   celery -A notification_backend beat --loglevel=info
+NOTIFICATION_SCHEDULER_INTERVAL = config('NOTIFICATION_SCHEDULER_INTERVAL', default=15, cast=int)  # seconds
+NOTIFICATION_SCHEDULER_BATCH_SIZE = config('NOTIFICATION_SCHEDULER_BATCH_SIZE', default=1000, cast=int)
+NOTIFICATION_SCHEDULER_MAX_BATCHES = config('NOTIFICATION_SCHEDULER_MAX_BATCHES', default=50, cast=int)
+# Claimed notifications whose delivery task was not queued within this time are released again
+NOTIFICATION_SCHEDULER_LEASE_SECONDS = config('NOTIFICATION_SCHEDULER_LEASE_SECONDS', default=300, cast=int)
+
+# Client receipts/opens buffered in a Redis stream and applied in bulk
+NOTIFICATION_RECEIPTS_INTERVAL = config('NOTIFICATION_RECEIPTS_INTERVAL', default=5, cast=int)  # seconds
+NOTIFICATION_RECEIPTS_BATCH_SIZE = config('NOTIFICATION_RECEIPTS_BATCH_SIZE', default=200, cast=int)  # stream entries
+NOTIFICATION_RECEIPTS_MAX_BATCHES = config('NOTIFICATION_RECEIPTS_MAX_BATCHES', default=50, cast=int)
+NOTIFICATION_RECEIPTS_MAX_BUFFER = config('NOTIFICATION_RECEIPTS_MAX_BUFFER', default=1000000, cast=int)
+
+CELERY_BEAT_SCHEDULE = {
+    'release-scheduled-notifications': {
+        'task': 'notifications.tasks.release_scheduled_notifications',
+        'schedule': NOTIFICATION_SCHEDULER_INTERVAL,
+    },
+    'apply-notification-receipts': {
+        'task': 'notifications.tasks.apply_notification_receipts',
+        'schedule': NOTIFICATION_RECEIPTS_INTERVAL,
+    },
+    'prune-device-tokens': {
+        'task': 'notifications.tasks.prune_device_tokens',
+        'schedule': crontab(hour=3, minute=0),
+    },
+}
+
+# Device token hygiene
+DEVICE_TOKEN_STALE_DAYS = config('DEVICE_TOKEN_STALE_DAYS', default=60, cast=int)
+DEVICE_PURGE_AFTER_DAYS = config('DEVICE_PURGE_AFTER_DAYS', default=90, cast=int)
+DEVICE_HYGIENE_BATCH_SIZE = config('DEVICE_HYGIENE_BATCH_SIZE', default=500, cast=int)
 
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# WebP thumbnails of profile pictures, rendered by accounts.tasks.generate_profile_thumbnail
+PROFILE_THUMBNAIL_SIZE = config('PROFILE_THUMBNAIL_SIZE', default=128, cast=int)  # pixels, longest side
+PROFILE_THUMBNAIL_QUALITY = config('PROFILE_THUMBNAIL_QUALITY', default=80, cast=int)
+
 # Static files production
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Admin changelists show the planner's row estimate instead of COUNT(*) above this size
+ADMIN_ESTIMATED_COUNT_THRESHOLD = config('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=100000, cast=int)
+
+# Post feed cache (Redis sorted set of post IDs plus serialized post fragments)
+FEED_CACHE_ENABLED = config('FEED_CACHE_ENABLED', default=True, cast=bool)
+FEED_CACHE_SIZE = config('FEED_CACHE_SIZE', default=1000, cast=int)
+FEED_CACHE_TTL = config('FEED_CACHE_TTL', default=3600, cast=int)
+
+# Cached post detail, comment list pages and author profiles (see posts/response_cache.py)
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+RESPONSE_CACHE_TTL = config('RESPONSE_CACHE_TTL', default=300, cast=int)  # seconds
+
+# Serve the notification polling endpoints from async views (run under uvicorn)
+ASYNC_NOTIFICATION_VIEWS = config('ASYNC_NOTIFICATION_VIEWS', default=False, cast=bool)
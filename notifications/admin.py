@@ -1,20 +1,104 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import Notification, NotificationDelivery
+from django.core.paginator import Paginator
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.utils.functional import cached_property
+from . import exports
+from .models import Notification, NotificationDelivery, NotificationPreference, MutedPost
+
+
+class EstimatedCountPaginator(Paginator):
+    """Use the planner's row estimate instead of COUNT(*) for unfiltered huge tables"""
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self._estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+    
+    def _estimated_count(self, model, using):
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with tens of millions of rows: estimated
+    counts, no second unfiltered COUNT(*), raw ID widgets instead of <select>s
+    of every user, and index-friendly search (exact ID or phone number prefix).
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 20
+    
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term.strip().isdigit():
+            results |= queryset.filter(pk=int(search_term))
+        return results, may_have_duplicates
 
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeTableAdmin):
     list_display = ('id', 'recipient', 'sender', 'notification_type', 'title', 'is_read', 'is_sent', 'created_at')
     list_filter = ('notification_type', 'is_read', 'is_sent', 'created_at')
-    search_fields = ('recipient__phone_number', 'sender__phone_number', 'title', 'message')
+    list_select_related = ('recipient', 'sender')
+    search_fields = ('recipient__phone_number__startswith', 'sender__phone_number__startswith')
+    search_help_text = 'Notification ID, or the start of the recipient/sender phone number'
+    raw_id_fields = ('recipient', 'sender', 'post', 'comment')
     readonly_fields = ('created_at', 'read_at')
-    list_per_page = 20
 
 
 @admin.register(NotificationDelivery)
-class NotificationDeliveryAdmin(admin.ModelAdmin):
+class NotificationDeliveryAdmin(LargeTableAdmin):
     list_display = ('notification_id', 'device', 'is_delivered', 'delivered_at', 'created_at')
     list_filter = ('is_delivered', 'delivered_at', 'created_at')
-    search_fields = ('notification__title', 'device__user__phone_number')
+    list_select_related = ('device__user',)
+    search_fields = ('device__user__phone_number__startswith',)
+    search_help_text = 'Delivery ID, or the start of the recipient phone number'
+    raw_id_fields = ('notification', 'device')
     readonly_fields = ('created_at', 'delivered_at')
-    list_per_page = 20
+    actions = ['export_csv', 'export_report_csv']
+    
+    @admin.action(description='Export selected deliveries as CSV')
+    def export_csv(self, request, queryset):
+        rows = exports.delivery_rows(queryset)
+        columns = [name for name, _ in exports.DELIVERY_COLUMNS]
+        response = StreamingHttpResponse(exports.iter_csv(rows, columns), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="notification_deliveries.csv"'
+        return response
+    
+    @admin.action(description='Export delivery rate report (per day/type) as CSV')
+    def export_report_csv(self, request, queryset):
+        rows = exports.delivery_rate_report(queryset).iterator()
+        response = StreamingHttpResponse(exports.iter_csv(rows, exports.REPORT_COLUMNS), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="notification_delivery_report.csv"'
+        return response
+
+
+@admin.register(NotificationPreference)
+class NotificationPreferenceAdmin(admin.ModelAdmin):
+    list_display = ('user', 'enabled_types', 'quiet_hours_start', 'quiet_hours_end', 'timezone', 'updated_at')
+    search_fields = ('user__phone_number',)
+    raw_id_fields = ('user',)
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(MutedPost)
+class MutedPostAdmin(admin.ModelAdmin):
+    list_display = ('user', 'post', 'created_at')
+    search_fields = ('user__phone_number',)
+    raw_id_fields = ('user', 'post')
+    readonly_fields = ('created_at',)
@@ -0,0 +1,119 @@
+"""
+Async versions of the notification polling endpoints.
+
+Mobile clients poll the unread count and list far more often than anything
+else; under an ASGI server (uvicorn) these views wait on the database without
+holding a worker thread per connection. They keep the JSON shape of the DRF
+views in views.py and are enabled with ASYNC_NOTIFICATION_VIEWS=True.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from accounts.models import User
+from notification_backend.db_router import areplica_reads, pin_to_primary
+from .models import Notification
+from .serializers import NotificationSerializer
+
+
+async def _authenticate(request):
+    """Run simplejwt authentication (token check plus a user lookup) off the event loop"""
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return result[0] if result else None
+
+
+def _unauthorized():
+    return JsonResponse(
+        {"detail": "Authentication credentials were not provided."},
+        status=401
+    )
+
+
+async def _paginated(request, queryset):
+    """PageNumberPagination-compatible response built with the async ORM"""
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    try:
+        page_number = int(request.GET.get('page', 1))
+    except ValueError:
+        page_number = 0
+
+    count = await queryset.acount()
+    last_page = max(1, -(-count // page_size))
+    if page_number < 1 or page_number > last_page:
+        return JsonResponse({"detail": "Invalid page."}, status=404)
+
+    start = (page_number - 1) * page_size
+    items = [item async for item in queryset[start:start + page_size]]
+    # The serializer falls back to the sender row when there is no snapshot; load those
+    # senders here, since lazy loading isn't allowed on the event loop
+    sender_ids = {item.sender_id for item in items if not item.sender_snapshot}
+    if sender_ids:
+        senders = {user.id: user async for user in User.objects.filter(id__in=sender_ids)}
+        for item in items:
+            if item.sender_id in senders:
+                item.sender = senders[item.sender_id]
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, 'page', page_number + 1) if page_number < last_page else None
+    if page_number == 1:
+        previous_url = None
+    elif page_number == 2:
+        previous_url = remove_query_param(url, 'page')
+    else:
+        previous_url = replace_query_param(url, 'page', page_number - 1)
+
+    return JsonResponse({
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': NotificationSerializer(items, many=True, context={'request': request}).data,
+    })
+
+
+@require_GET
+async def notification_list(request):
+    """List notifications for the current user"""
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+
+    async with areplica_reads(user):
+        return await _paginated(request, Notification.objects.for_recipient(user))
+
+
+@require_GET
+async def unread_notification_count(request):
+    """Get count of unread notifications"""
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+
+    async with areplica_reads(user):
+        count = await Notification.objects.for_recipient(user).filter(is_read=False).acount()
+
+    return JsonResponse({"count": count})
+
+
+@csrf_exempt
+@require_POST
+async def mark_all_notifications_read(request):
+    """Mark all notifications as read for the current user"""
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+
+    updated_count = await Notification.objects.for_recipient(user).filter(
+        is_read=False
+    ).aupdate(is_read=True, read_at=timezone.now())
+    await sync_to_async(pin_to_primary)(user)
+
+    return JsonResponse({"message": f"{updated_count} notifications marked as read"})
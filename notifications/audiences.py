@@ -0,0 +1,247 @@
+"""
+Precomputed recipient sets for notification fan-out.
+
+Each audience is a Redis sorted set of user IDs, so fan-out can stream
+recipients in ID order (ZRANGEBYSCORE ... LIMIT) without scanning the user
+table, and small audiences cost proportionally less. Sets are maintained
+incrementally by signals and rebuilt in full by `manage.py rebuild_audiences`.
+
+Audiences:
+    'all'               every active user (score = user ID)
+    'device:<type>'     users with an active device of that type (score = user ID)
+    'recent'            users active in the last AUDIENCE_RECENT_DAYS (score = last seen timestamp)
+    'segment:<name>'    custom segments managed with add_to_segment()/remove_from_segment()
+"""
+import logging
+import time
+from datetime import timedelta
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+from accounts.models import User, UserDevice
+from notification_backend.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+ALL = 'all'
+RECENT = 'recent'
+READY_KEY = 'audience:ready'
+
+
+def _key(audience):
+    return f'audience:{audience}'
+
+
+def device_audience(device_type):
+    return f'device:{device_type}'
+
+
+def segment_audience(name):
+    return f'segment:{name}'
+
+
+def _safe(operation):
+    try:
+        operation(get_redis())
+    except redis.RedisError as e:
+        logger.warning(f"Audience update failed: {e}")
+
+
+def add_user(user_id):
+    _safe(lambda client: client.zadd(_key(ALL), {user_id: user_id}))
+
+
+def remove_user(user_id):
+    """Drop a deactivated or deleted user from every ID-scored audience"""
+    def operation(client):
+        pipe = client.pipeline()
+        pipe.zrem(_key(ALL), user_id)
+        pipe.zrem(_key(RECENT), user_id)
+        for device_type, _ in UserDevice.DEVICE_TYPE_CHOICES:
+            pipe.zrem(_key(device_audience(device_type)), user_id)
+        pipe.execute()
+    _safe(operation)
+
+
+def sync_user_devices(user_id):
+    """Recompute a user's device-type memberships from their active devices"""
+    active_types = set(
+        UserDevice.objects.filter(user_id=user_id, is_active=True).values_list('device_type', flat=True)
+    )
+
+    def operation(client):
+        pipe = client.pipeline()
+        for device_type, _ in UserDevice.DEVICE_TYPE_CHOICES:
+            if device_type in active_types:
+                pipe.zadd(_key(device_audience(device_type)), {user_id: user_id})
+            else:
+                pipe.zrem(_key(device_audience(device_type)), user_id)
+        pipe.execute()
+    _safe(operation)
+
+
+def touch_user(user_id):
+    """Record activity for the 'recent' audience"""
+    _safe(lambda client: client.zadd(_key(RECENT), {user_id: time.time()}))
+
+
+def add_to_segment(name, user_ids):
+    if user_ids:
+        _safe(lambda client: client.zadd(_key(segment_audience(name)), {user_id: user_id for user_id in user_ids}))
+
+
+def remove_from_segment(name, user_ids):
+    if user_ids:
+        _safe(lambda client: client.zrem(_key(segment_audience(name)), *user_ids))
+
+
+def _recent_cutoff():
+    return time.time() - settings.AUDIENCE_RECENT_DAYS * 86400
+
+
+def _size_key(audience):
+    return f'audience-size:{audience}'
+
+
+def audience_size(audience):
+    """
+    Approximate number of recipients in an audience, cheap enough for request
+    paths: the set size when the audiences are built, else a database count
+    cached for AUDIENCE_SIZE_CACHE_SECONDS. None if Redis is unavailable.
+    """
+    try:
+        client = get_redis()
+        if client.exists(READY_KEY):
+            if audience == RECENT:
+                return client.zcount(_key(RECENT), _recent_cutoff(), '+inf')
+            return client.zcard(_key(audience))
+        size = client.get(_size_key(audience))
+        if size is None:
+            size = _database_queryset(audience).count()
+            client.set(_size_key(audience), size, ex=settings.AUDIENCE_SIZE_CACHE_SECONDS)
+        return int(size)
+    except redis.RedisError as e:
+        logger.warning(f"Audience size lookup failed: {e}")
+        return None
+
+
+def iter_recipient_ids(audience, exclude=(), batch_size=500):
+    """Yield lists of recipient user IDs for an audience, batch_size at a time"""
+    exclude = set(exclude)
+    try:
+        client = get_redis()
+        ready = client.exists(READY_KEY)
+    except redis.RedisError as e:
+        logger.warning(f"Audience store unavailable, falling back to the database: {e}")
+        ready = False
+
+    batches = _iter_redis(client, audience, batch_size) if ready else _iter_database(audience, batch_size)
+    for batch in batches:
+        batch = [user_id for user_id in batch if user_id not in exclude]
+        if batch:
+            yield batch
+
+
+def _iter_redis(client, audience, batch_size):
+    key = _key(audience)
+    # Where to resume from the database if Redis goes away part way through
+    seen, last_id = set(), 0
+    try:
+        if audience == RECENT:
+            # Scores are last-seen timestamps that touch_user() moves forward while we
+            # page, so page by score instead of offset: a user touched mid-way moves
+            # behind the cursor and is de-duplicated, but is never skipped. ties counts
+            # the members already yielded at min_score.
+            min_score, ties = _recent_cutoff(), 0
+            while True:
+                rows = client.zrangebyscore(key, min_score, '+inf', start=ties, num=batch_size, withscores=True)
+                if not rows:
+                    return
+                batch = []
+                for user_id, score in rows:
+                    if score == min_score:
+                        ties += 1
+                    else:
+                        min_score, ties = score, 1
+                    user_id = int(user_id)
+                    if user_id not in seen:
+                        seen.add(user_id)
+                        batch.append(user_id)
+                yield batch
+        else:
+            # Scores are user IDs: page by score so concurrent inserts never repeat or skip
+            while True:
+                ids = client.zrangebyscore(key, f'({last_id}', '+inf', start=0, num=batch_size)
+                if not ids:
+                    return
+                batch = [int(user_id) for user_id in ids]
+                last_id = batch[-1]
+                yield batch
+    except redis.RedisError as e:
+        logger.warning(f"Audience store failed part way through {audience}, continuing from the database: {e}")
+
+    for batch in _iter_database(audience, batch_size, after_id=last_id):
+        yield [user_id for user_id in batch if user_id not in seen]
+
+
+def _database_queryset(audience):
+    if audience == ALL:
+        return User.objects.filter(is_active=True).values_list('id', flat=True)
+    if audience.startswith('device:'):
+        return UserDevice.objects.filter(
+            is_active=True,
+            device_type=audience.split(':', 1)[1],
+            user__is_active=True
+        ).values_list('user_id', flat=True).distinct()
+    if audience == RECENT:
+        return User.objects.filter(
+            is_active=True,
+            last_login__gte=timezone.now() - timedelta(days=settings.AUDIENCE_RECENT_DAYS)
+        ).values_list('id', flat=True)
+    logger.warning(f"Audience {audience} is only available from the audience store")
+    return User.objects.none().values_list('id', flat=True)
+
+
+def _iter_database(audience, batch_size, after_id=0):
+    """Stream an audience from the database in user ID order, starting after after_id"""
+    field = 'user_id' if audience.startswith('device:') else 'id'
+    queryset = _database_queryset(audience).filter(**{f'{field}__gt': after_id}).order_by(field)
+    batch = []
+    for user_id in queryset.iterator(chunk_size=batch_size):
+        batch.append(user_id)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def rebuild(batch_size=5000):
+    """Recompute the database-derived audiences into temporary keys and swap them in"""
+    client = get_redis()
+    audiences = [ALL] + [device_audience(device_type) for device_type, _ in UserDevice.DEVICE_TYPE_CHOICES]
+    sizes = {}
+    for audience in audiences:
+        temp_key = f'{_key(audience)}:rebuild'
+        client.delete(temp_key)
+        sizes[audience] = 0
+        for batch in _iter_database(audience, batch_size):
+            client.zadd(temp_key, {user_id: user_id for user_id in batch})
+            sizes[audience] += len(batch)
+        if sizes[audience]:
+            client.rename(temp_key, _key(audience))
+        else:
+            client.delete(_key(audience))
+    # 'recent' is fed by touch_user(); seed it from last_login and drop expired entries
+    recent_logins = User.objects.filter(
+        is_active=True,
+        last_login__gte=timezone.now() - timedelta(days=settings.AUDIENCE_RECENT_DAYS)
+    ).values_list('id', 'last_login')
+    for user_id, last_login in recent_logins.iterator(chunk_size=batch_size):
+        client.zadd(_key(RECENT), {user_id: last_login.timestamp()}, gt=True)
+    client.zremrangebyscore(_key(RECENT), '-inf', _recent_cutoff())
+    sizes[RECENT] = client.zcard(_key(RECENT))
+    client.set(READY_KEY, 1)
+    return sizes
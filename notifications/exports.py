@@ -0,0 +1,123 @@
+"""
+Streaming exports of delivery analytics.
+
+Rows are read with .values_list().iterator(chunk_size=...) so exports of any
+size run in constant memory, both from the export_deliveries management
+command and the NotificationDelivery admin action.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast, TruncDate
+
+from accounts.models import UserDevice
+from notification_backend.db_router import notification_databases
+from .models import NotificationDelivery
+
+# (column name, ORM lookup) for each exported delivery row. device_type has no
+# lookup: devices live on the primary, deliveries possibly on a shard.
+DELIVERY_COLUMNS = (
+    ('delivery_id', 'id'),
+    ('notification_id', 'notification_id'),
+    ('notification_type', 'notification__notification_type'),
+    ('recipient_id', 'notification__recipient_id'),
+    ('sender_id', 'notification__sender_id'),
+    ('post_id', 'notification__post_id'),
+    ('device_id', 'device_id'),
+    ('device_type', None),
+    ('is_delivered', 'is_delivered'),
+    ('delivered_at', 'delivered_at'),
+    ('received_at', 'received_at'),
+    ('error_message', 'error_message'),
+    ('is_read', 'notification__is_read'),
+    ('opened_at', 'notification__opened_at'),
+    ('notification_created_at', 'notification__created_at'),
+    ('created_at', 'created_at'),
+)
+
+REPORT_COLUMNS = ('day', 'notification_type', 'total', 'delivered', 'failed', 'delivery_rate')
+
+
+def delivery_rows(queryset=None, chunk_size=2000):
+    """Yield one dict per delivery joined with its notification and device"""
+    if queryset is None:
+        queryset = NotificationDelivery.objects.all()
+    names = [name for name, _ in DELIVERY_COLUMNS]
+    selected = [(name, lookup) for name, lookup in DELIVERY_COLUMNS if lookup]
+    values = queryset.order_by().values_list(*[lookup for _, lookup in selected]).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = [dict(zip([name for name, _ in selected], row)) for row in islice(values, chunk_size)]
+        if not chunk:
+            break
+        device_types = dict(
+            UserDevice.objects.filter(id__in={row['device_id'] for row in chunk}).values_list('id', 'device_type')
+        )
+        for row in chunk:
+            row['device_type'] = device_types.get(row['device_id'])
+            yield {name: row[name] for name in names}
+
+
+def sharded(queryset):
+    """The same delivery query against every database holding notifications"""
+    return [queryset.using(alias) for alias in notification_databases()]
+
+
+def delivery_rate_report(queryset=None):
+    """Per-day, per-type delivery counts and rates aggregated in SQL"""
+    if queryset is None:
+        queryset = NotificationDelivery.objects.all()
+    return queryset.order_by().values(
+        day=TruncDate('created_at'),
+        notification_type=F('notification__notification_type')
+    ).annotate(
+        total=Count('id'),
+        delivered=Count('id', filter=Q(is_delivered=True)),
+        failed=Count('id', filter=Q(is_delivered=False)),
+    ).annotate(
+        delivery_rate=Cast('delivered', FloatField()) / Cast('total', FloatField())
+    ).order_by('day', 'notification_type')
+
+
+def merge_reports(reports):
+    """Combine delivery_rate_report rows from several databases into one report"""
+    merged = {}
+    for report in reports:
+        for row in report:
+            key = (row['day'], row['notification_type'])
+            totals = merged.setdefault(key, {
+                'day': row['day'],
+                'notification_type': row['notification_type'],
+                'total': 0,
+                'delivered': 0,
+                'failed': 0,
+            })
+            for column in ('total', 'delivered', 'failed'):
+                totals[column] += row[column]
+
+    for key in sorted(merged):
+        row = merged[key]
+        row['delivery_rate'] = row['delivered'] / row['total'] if row['total'] else None
+        yield row
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, columns):
+    writer = csv.DictWriter(_Echo(), fieldnames=columns)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
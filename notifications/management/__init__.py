@@ -0,0 +1 @@
+# management/__init__.py
@@ -0,0 +1,91 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from kombu.compression import compress
+from kombu.serialization import dumps
+
+from notification_backend.celery import app
+
+QUEUE = 'benchmark.broker'
+TASK_NAME = 'notifications.tasks.send_notifications_batch'
+
+# (label, serializer, compression): the previous profile first, then the current one's parts
+PROFILES = [
+    ('json', 'json', None),
+    ('json+zlib', 'json', 'zlib'),
+    ('msgpack', 'msgpack', None),
+    ('msgpack+zlib', 'msgpack', 'zlib'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure broker publish/consume throughput and message size of delivery batches '
+        'for each serializer and compression profile'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000, help='Messages published per profile')
+        parser.add_argument('--batch-size', type=int, default=settings.NOTIFICATION_DELIVERY_BATCH_SIZE,
+                            help='(notification, user) pairs per message')
+        parser.add_argument('--broker', default=settings.CELERY_BROKER_URL,
+                            help='Broker URL (e.g. a scratch Redis database)')
+
+    def handle(self, *args, **options):
+        messages = options['messages']
+        # Realistic IDs, so message sizes match production batches
+        pairs = [(10_000_000 + index, 1_000_000 + index) for index in range(options['batch_size'])]
+
+        self.stdout.write(f"Broker {options['broker']}: {messages} messages of {len(pairs)} pairs per profile")
+        self.stdout.write(f"{'profile':<14}{'publish/s':>12}{'consume/s':>12}{'body bytes':>12}")
+
+        with app.connection_for_write(options['broker']) as connection:
+            for label, serializer, compression in PROFILES:
+                self._purge(connection)
+                started = time.perf_counter()
+                with connection.Producer() as producer:
+                    for _ in range(messages):
+                        app.send_task(
+                            TASK_NAME, args=(pairs,), queue=QUEUE, serializer=serializer,
+                            compression=compression, producer=producer, ignore_result=True
+                        )
+                published = time.perf_counter() - started
+
+                consumed, elapsed = self._consume(connection, messages)
+                if consumed != messages:
+                    raise CommandError(f'{label}: consumed {consumed} of {messages} messages')
+                self.stdout.write(
+                    f'{label:<14}{messages / published:>12.0f}{consumed / elapsed:>12.0f}'
+                    f'{self._body_size(pairs, serializer, compression):>12}'
+                )
+            self._purge(connection)
+
+    def _consume(self, connection, expected):
+        """Drain the benchmark queue, decoding each message as a worker would"""
+        queue = connection.SimpleQueue(QUEUE, accept=settings.CELERY_ACCEPT_CONTENT)
+        consumed = 0
+        started = time.perf_counter()
+        try:
+            while consumed < expected:
+                message = queue.get(timeout=5)
+                message.decode()
+                message.ack()
+                consumed += 1
+        except queue.Empty:
+            pass
+        finally:
+            queue.close()
+        return consumed, time.perf_counter() - started
+
+    def _body_size(self, pairs, serializer, compression):
+        """Bytes of the task message body on the wire (headers are the same for every profile)"""
+        _, _, body = dumps(((pairs,), {}, {}), serializer)
+        if compression:
+            body, _ = compress(body, compression)
+        return len(body)
+
+    def _purge(self, connection):
+        queue = connection.SimpleQueue(QUEUE)
+        queue.clear()
+        queue.close()
@@ -0,0 +1,64 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test running servers with concurrent notification polling requests. Pass the same '
+        'endpoint on a WSGI (gunicorn) and an ASGI (uvicorn) server to compare them side by side.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', nargs='+', default=['http://127.0.0.1:8000/api/notifications/count/'],
+                            help='Endpoint(s) to poll, one after the other')
+        parser.add_argument('--token', required=True, help='JWT access token sent as Bearer')
+        parser.add_argument('--concurrency', type=int, default=100, help='Number of concurrent clients')
+        parser.add_argument('--requests', type=int, default=2000, help='Total number of requests per URL')
+        parser.add_argument('--timeout', type=float, default=10, help='Per-request timeout in seconds')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{options['concurrency']} clients, {options['requests']} requests per URL")
+        self.stdout.write(f"{'url':<48}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'failed':>8}")
+        for url in options['url']:
+            throughput, quantiles, failed = self._run(url, options)
+            style = self.style.SUCCESS if failed == 0 else self.style.ERROR
+            self.stdout.write(style(
+                f'{url:<48}{throughput:>8.0f}{quantiles[49]:>9.1f}{quantiles[94]:>9.1f}'
+                f'{quantiles[98]:>9.1f}{failed:>8}'
+            ))
+
+    def _run(self, url, options):
+        """Return (requests/s, latency percentiles in ms, failed requests) for one endpoint"""
+        headers = {'Authorization': f"Bearer {options['token']}"}
+        timeout = options['timeout']
+
+        def poll(_):
+            request = urllib.request.Request(url, headers=headers)
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except (urllib.error.URLError, OSError):
+                status = None
+            return status, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(poll, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency * 1000 for status, latency in results if status == 200)
+        failed = len(results) - len(latencies)
+        if not latencies:
+            raise CommandError(f'All {failed} requests to {url} failed, is the server running and the token valid?')
+
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        return len(latencies) / elapsed, quantiles, failed
@@ -0,0 +1,97 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from accounts.models import User, UserDevice
+from notifications.models import Notification, NotificationDelivery
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent Notification/NotificationDelivery writes against the default database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Number of concurrent writer threads')
+        parser.add_argument('--writes', type=int, default=200, help='Notifications written per worker')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        writes = options['writes']
+
+        journal_mode = 'n/a'
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+
+        sender, recipient, devices = self._create_fixtures(workers)
+
+        self.stdout.write(
+            f'Running {workers} workers x {writes} writes '
+            f'(vendor={connection.vendor}, journal_mode={journal_mode})'
+        )
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(
+                    lambda device: self._write(sender, recipient, device, writes),
+                    devices
+                ))
+            elapsed = time.perf_counter() - started
+        finally:
+            User.objects.filter(id__in=[sender.id, recipient.id]).delete()
+
+        written = sum(result['written'] for result in results)
+        locked = sum(result['locked'] for result in results)
+
+        self.stdout.write(f'Rows written: {written} notifications in {elapsed:.2f}s '
+                          f'({written / elapsed:.0f}/s)')
+        style = self.style.SUCCESS if locked == 0 else self.style.ERROR
+        self.stdout.write(style(f'"database is locked" errors: {locked}'))
+
+    def _create_fixtures(self, workers):
+        suffix = int(time.time() * 1000) % 10 ** 9
+        sender = User.objects.create_user(phone_number=f'+0{suffix}1', first_name='Bench')
+        recipient = User.objects.create_user(phone_number=f'+0{suffix}2', first_name='Bench')
+        devices = [
+            UserDevice.objects.create(
+                user=recipient,
+                fcm_token=f'benchmark-{suffix}-{index}',
+                device_id=f'benchmark-{index}'
+            )
+            for index in range(workers)
+        ]
+        return sender, recipient, devices
+
+    def _write(self, sender, recipient, device, writes):
+        """Mimic a delivery worker: create, track and mark each notification sent"""
+        written = 0
+        locked = 0
+        try:
+            for _ in range(writes):
+                try:
+                    with transaction.atomic():
+                        notification = Notification.objects.create(
+                            recipient=recipient,
+                            sender=sender,
+                            notification_type='new_post',
+                            title='Benchmark',
+                            message='Benchmark notification'
+                        )
+                        NotificationDelivery.objects.create(notification=notification, device=device)
+                    NotificationDelivery.objects.filter(notification=notification, device=device).update(
+                        is_delivered=True,
+                        delivered_at=timezone.now()
+                    )
+                    written += 1
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    locked += 1
+        finally:
+            close_old_connections()
+            connection.close()
+        return {'written': written, 'locked': locked}
@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Code run in a fresh interpreter to mimic each process type's startup
+STARTUP_CODE = {
+    'web': (
+        'import django; django.setup(); '
+        'from django.core.wsgi import get_wsgi_application; get_wsgi_application(); '
+        f'import {settings.ROOT_URLCONF}'
+    ),
+    'worker': (
+        'import django; django.setup(); '
+        'from notification_backend.celery import app; app.loader.import_default_modules()'
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure cold import time of web and Celery worker processes with python -X importtime'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--process', choices=[*STARTUP_CODE, 'all'], default='all',
+                            help='Process type to measure')
+        parser.add_argument('--runs', type=int, default=3, help='Fresh interpreters started per process type')
+        parser.add_argument('--top', type=int, default=10, help='Slowest top-level imports to list')
+
+    def handle(self, *args, **options):
+        processes = list(STARTUP_CODE) if options['process'] == 'all' else [options['process']]
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'notification_backend.settings')}
+
+        for process in processes:
+            wall_times = []
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                result = subprocess.run(
+                    [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE[process]],
+                    env=env,
+                    capture_output=True,
+                    text=True
+                )
+                wall_times.append(time.perf_counter() - started)
+                if result.returncode != 0:
+                    raise CommandError(f'{process} startup failed:\n{result.stderr[-2000:]}')
+
+            imports = self._parse(result.stderr)
+            self.stdout.write(self.style.SUCCESS(
+                f'{process}: best {min(wall_times) * 1000:.0f}ms wall, '
+                f'{sum(cumulative for _, cumulative in imports) / 1000:.0f}ms in imports '
+                f'({options["runs"]} runs)'
+            ))
+            for name, cumulative in sorted(imports, key=lambda item: item[1], reverse=True)[:options['top']]:
+                self.stdout.write(f'  {cumulative / 1000:8.1f}ms  {name}')
+
+            loaded = {name for name, _ in self._parse(result.stderr, top_level=False)}
+            if 'firebase_admin' in loaded:
+                self.stdout.write(self.style.WARNING('  firebase_admin is imported at startup'))
+
+    def _parse(self, stderr, top_level=True):
+        """Return (module, cumulative microseconds) pairs from -X importtime output"""
+        imports = []
+        for line in stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            # Nested imports are indented under the module that triggered them
+            if top_level and name.startswith('  '):
+                continue
+            imports.append((name.strip(), int(cumulative)))
+        return imports
@@ -0,0 +1,74 @@
+import gzip
+import sys
+from itertools import chain
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from notifications import exports
+from notifications.models import NotificationDelivery
+
+
+class Command(BaseCommand):
+    help = 'Stream notification delivery analytics to CSV or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help='Output format')
+        parser.add_argument('--output', default='-', help='Output file path (default: stdout)')
+        parser.add_argument('--gzip', action='store_true', help='Gzip-compress the output')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip')
+        parser.add_argument('--since', type=str, help='Only deliveries created on or after this date (YYYY-MM-DD)')
+        parser.add_argument(
+            '--report',
+            action='store_true',
+            help='Export the per-day/per-type delivery rate report instead of raw rows'
+        )
+
+    def handle(self, *args, **options):
+        queryset = NotificationDelivery.objects.all()
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--since must be formatted as YYYY-MM-DD')
+            queryset = queryset.filter(created_at__gte=timezone.make_aware(datetime.combine(since, time.min)))
+
+        querysets = exports.sharded(queryset)
+        if options['report']:
+            reports = [exports.delivery_rate_report(shard).iterator() for shard in querysets]
+            rows = reports[0] if len(reports) == 1 else exports.merge_reports(reports)
+            columns = exports.REPORT_COLUMNS
+        else:
+            rows = chain.from_iterable(
+                exports.delivery_rows(shard, chunk_size=options['chunk_size']) for shard in querysets
+            )
+            columns = [name for name, _ in exports.DELIVERY_COLUMNS]
+
+        if options['format'] == 'csv':
+            chunks = exports.iter_csv(rows, columns)
+        else:
+            chunks = exports.iter_jsonl(rows)
+
+        stream = self._open(options['output'], options['gzip'])
+        written = 0
+        try:
+            for chunk in chunks:
+                stream.write(chunk)
+                written += 1
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+        if options['output'] != '-':
+            lines = written - 1 if options['format'] == 'csv' else written
+            self.stderr.write(self.style.SUCCESS(f"Exported {lines} rows to {options['output']}"))
+
+    def _open(self, path, compress):
+        if compress:
+            if path == '-':
+                return gzip.open(sys.stdout.buffer, 'wt', newline='')
+            return gzip.open(path, 'wt', newline='')
+        if path == '-':
+            return sys.stdout
+        return open(path, 'w', newline='')
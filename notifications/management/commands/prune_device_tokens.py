@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from notifications import token_hygiene
+
+
+class Command(BaseCommand):
+    help = 'Validate FCM tokens, deactivate stale ones and purge old inactive devices'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--skip-validation',
+            action='store_true',
+            help='Skip dry-run validation sends against FCM'
+        )
+
+    def handle(self, *args, **options):
+        report = token_hygiene.run(validate=not options['skip_validation'])
+
+        if 'validation' in report:
+            validation = report['validation']
+            self.stdout.write(f"Validated {validation['checked']} tokens, {validation['invalid']} invalid")
+        self.stdout.write(f"Deactivated {report['stale']['deactivated']} stale tokens")
+        self.stdout.write(
+            f"Purged {report['purged']['devices']} inactive devices "
+            f"and {report['purged']['deliveries']} delivery records"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed tokens received {report['sends_saved']} sends in the last period; "
+            f"that is roughly how many sends this saves per period going forward"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from notifications import audiences
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed notification audience sets from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='User IDs read and written per batch')
+
+    def handle(self, *args, **options):
+        sizes = audiences.rebuild(batch_size=options['batch_size'])
+        for audience, size in sizes.items():
+            self.stdout.write(f'{audience}: {size} users')
+        self.stdout.write(self.style.SUCCESS('Audiences rebuilt'))
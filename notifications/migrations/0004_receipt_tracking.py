@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='opened_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notificationdelivery',
+            name='received_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
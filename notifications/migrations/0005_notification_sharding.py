@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:32
+
+from django.conf import settings
+from django.db import migrations
+
+from . import _shards
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_device_identity'),
+        ('notifications', '0004_receipt_tracking'),
+        ('posts', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Notification shards get the notification tables as of this migration; the
+        # primary already has them (with constraints) from the earlier migrations
+        _shards.create_models('Notification', 'NotificationDelivery'),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:34
+
+from django.db import migrations, models
+
+
+def enable_thread_comments(apps, schema_editor):
+    """Users who had every type enabled keep receiving every type"""
+    NotificationPreference = apps.get_model('notifications', 'NotificationPreference')
+    NotificationPreference.objects.filter(enabled_types=3).update(enabled_types=7)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notification_sharding'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('new_post', 'New Post'), ('new_comment', 'New Comment'), ('thread_comment', 'Thread Comment')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='notificationpreference',
+            name='enabled_types',
+            field=models.PositiveIntegerField(default=7),
+        ),
+        migrations.RunPython(enable_thread_comments, migrations.RunPython.noop),
+    ]
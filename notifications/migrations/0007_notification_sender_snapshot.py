@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:41
+
+from datetime import timezone
+
+from django.db import DEFAULT_DB_ALIAS, migrations, models
+
+from . import _shards
+
+BATCH_SIZE = 1000
+
+
+def _isoformat(value):
+    """DRF's DateTimeField output (TIME_ZONE is UTC): ISO 8601 with 'Z' for UTC"""
+    value = value.astimezone(timezone.utc).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def snapshot_senders(apps, schema_editor):
+    """
+    Existing notifications get their sender's current profile. The fields are
+    UserProfileSerializer's as of this migration, spelled out so later
+    serializer changes don't change what the migration writes.
+    """
+    Notification = apps.get_model('notifications', 'Notification')
+    User = apps.get_model('accounts', 'User')
+    db = schema_editor.connection.alias
+    sender_ids = list(Notification.objects.using(db).values_list('sender_id', flat=True).distinct())
+
+    for start in range(0, len(sender_ids), BATCH_SIZE):
+        # Users stay on the default database when notifications are sharded
+        for user in User.objects.using(DEFAULT_DB_ALIAS).filter(id__in=sender_ids[start:start + BATCH_SIZE]):
+            Notification.objects.using(db).filter(sender_id=user.id).update(sender_snapshot={
+                'id': user.id,
+                'phone_number': user.phone_number,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'profile_picture': user.profile_picture.url if user.profile_picture else None,
+                'date_joined': _isoformat(user.date_joined),
+            })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_device_identity'),
+        ('notifications', '0006_thread_comment_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='sender_snapshot',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        _shards.add_field('Notification', 'sender_snapshot'),
+        migrations.RunPython(snapshot_senders, migrations.RunPython.noop, hints=_shards.SHARD_HINTS),
+    ]
@@ -0,0 +1,75 @@
+"""
+Schema operations for notification shards.
+
+Shards hold only the notification tables, so the regular operations (whose foreign
+keys point at users, posts and devices) never run there; NotificationShardRouter
+only lets operations hinted with SHARD_HINTS through. These RunPython helpers build
+the same tables on shards, without constraints on tables that live on the primary.
+Every schema change to a sharded model needs a matching helper call.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import migrations
+
+from notification_backend.db_router import SHARDED_MODELS
+
+SHARD_HINTS = {'shard': True}
+
+
+def _on_shard(schema_editor):
+    return schema_editor.connection.alias in settings.NOTIFICATION_SHARDS
+
+
+@contextmanager
+def _without_primary_constraints(model):
+    """Temporarily drop db_constraint on foreign keys to models that stay on the primary"""
+    fields = [
+        field for field in model._meta.local_fields
+        if field.is_relation and field.db_constraint
+        and field.related_model._meta.label_lower not in SHARDED_MODELS
+    ]
+    for field in fields:
+        field.db_constraint = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.db_constraint = True
+
+
+def create_models(*model_names):
+    """RunPython operation creating the given notifications models' tables on shards"""
+    def forwards(apps, schema_editor):
+        if not _on_shard(schema_editor):
+            return
+        for name in model_names:
+            model = apps.get_model('notifications', name)
+            with _without_primary_constraints(model):
+                schema_editor.create_model(model)
+
+    def backwards(apps, schema_editor):
+        if not _on_shard(schema_editor):
+            return
+        for name in reversed(model_names):
+            schema_editor.delete_model(apps.get_model('notifications', name))
+
+    return migrations.RunPython(forwards, backwards, hints=SHARD_HINTS)
+
+
+def add_field(model_name, field_name):
+    """RunPython operation mirroring an AddField on a sharded model onto shards"""
+    def forwards(apps, schema_editor):
+        if not _on_shard(schema_editor):
+            return
+        model = apps.get_model('notifications', model_name)
+        with _without_primary_constraints(model):
+            schema_editor.add_field(model, model._meta.get_field(field_name))
+
+    def backwards(apps, schema_editor):
+        if not _on_shard(schema_editor):
+            return
+        model = apps.get_model('notifications', model_name)
+        schema_editor.remove_field(model, model._meta.get_field(field_name))
+
+    return migrations.RunPython(forwards, backwards, hints=SHARD_HINTS)
@@ -1,15 +1,28 @@
 from django.db import models
 from django.conf import settings
+from notification_backend.db_router import shard_for
+
+
+class NotificationManager(models.Manager):
+    def shard(self, recipient):
+        """Manager bound to the database holding recipient's notifications"""
+        return self.db_manager(shard_for(getattr(recipient, 'pk', recipient)))
+    
+    def for_recipient(self, recipient):
+        return self.shard(recipient).filter(recipient=recipient)
 
 
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('new_post', 'New Post'),
         ('new_comment', 'New Comment'),
+        ('thread_comment', 'Thread Comment'),
     ]
     
     recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sent_notifications')
+    # Sender profile as of creation, so listings render without reading the users table
+    sender_snapshot = models.JSONField(default=dict, blank=True)
     notification_type = models.CharField(max_length=20, choices=NOTIFICATION_TYPES)
     title = models.CharField(max_length=255)
     message = models.TextField()
@@ -26,12 +39,27 @@ class Notification(models.Model):
     is_sent = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     read_at = models.DateTimeField(null=True, blank=True)
+    opened_at = models.DateTimeField(null=True, blank=True)
+    
+    objects = NotificationManager()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='notif_created_idx'),
+            models.Index(fields=['recipient', '-created_at'], name='notif_recipient_created_idx'),
+            models.Index(fields=['recipient', 'is_read'], name='notif_recipient_read_idx'),
+        ]
         
     def __str__(self):
         return f"{self.notification_type} to {self.recipient.phone_number}"
+    
+    def save(self, *args, **kwargs):
+        # Notifications created one by one (admin, scripts) get the snapshot fan-out writes
+        if not self.sender_snapshot and self.sender_id is not None:
+            from .serializers import sender_snapshot
+            self.sender_snapshot = sender_snapshot(self.sender)
+        super().save(*args, **kwargs)
 
 
 class NotificationDelivery(models.Model):
@@ -40,11 +68,63 @@ class NotificationDelivery(models.Model):
     device = models.ForeignKey('accounts.UserDevice', on_delete=models.CASCADE)
     is_delivered = models.BooleanField(default=False)
     delivered_at = models.DateTimeField(null=True, blank=True)
+    received_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         unique_together = ('notification', 'device')
+        indexes = [
+            models.Index(fields=['created_at'], name='delivery_created_idx'),
+        ]
+        
+    def __str__(self):
+        return f"{self.notification_id} to {self.device.user.phone_number}"
+
+
+class NotificationPreference(models.Model):
+    """Per-user delivery preferences; users without a row receive every notification type"""
+    TYPE_BITS = {
+        notification_type: 1 << index
+        for index, (notification_type, _) in enumerate(Notification.NOTIFICATION_TYPES)
+    }
+    ALL_TYPES = sum(TYPE_BITS.values())
+    
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_preference'
+    )
+    # Bitmask of enabled NOTIFICATION_TYPES (see TYPE_BITS)
+    enabled_types = models.PositiveIntegerField(default=ALL_TYPES)
+    
+    # Pushes that fall inside quiet hours are deferred until they end
+    quiet_hours_start = models.TimeField(null=True, blank=True)
+    quiet_hours_end = models.TimeField(null=True, blank=True)
+    timezone = models.CharField(max_length=64, default='UTC')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Preferences for {self.user.phone_number}"
+    
+    @property
+    def enabled_type_names(self):
+        return [name for name, bit in self.TYPE_BITS.items() if self.enabled_types & bit]
+    
+    @enabled_type_names.setter
+    def enabled_type_names(self, names):
+        self.enabled_types = sum(self.TYPE_BITS[name] for name in set(names))
+
+
+class MutedPost(models.Model):
+    """Posts a user no longer wants notifications about"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='muted_posts')
+    post = models.ForeignKey('posts.Post', on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('user', 'post')
         
     def __str__(self):
-        return f"{self.notification.id} to {self.device.user.phone_number}"
+        return f"{self.user.phone_number} muted post {self.post_id}"
@@ -0,0 +1,92 @@
+"""
+FCM payload construction.
+
+Titles and bodies are rendered from per-type templates once per notification
+(or once per broadcast), action_data is encoded as compact JSON once, and the
+resulting messaging.Notification and data dict are shared by every token the
+notification is sent to.
+"""
+import json
+from functools import lru_cache
+
+from django.utils import translation
+from django.utils.translation import gettext_noop
+
+from .transport import get_messaging
+
+# Per notification_type: (title, body template, screen the app opens)
+TEMPLATES = {
+    'new_post': (
+        gettext_noop('New Post'),
+        gettext_noop('{sender} posted something new'),
+        'post_detail',
+    ),
+    'new_comment': (
+        gettext_noop('New Comment'),
+        gettext_noop('{sender} commented on your post'),
+        'comment_detail',
+    ),
+    'thread_comment': (
+        gettext_noop('New Comment'),
+        gettext_noop('{sender} also commented on a post you commented on'),
+        'comment_detail',
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def _template(notification_type, language):
+    title, body, _ = TEMPLATES[notification_type]
+    with translation.override(language):
+        return translation.gettext(title), translation.gettext(body)
+
+
+def render(notification_type, sender_name):
+    """Return the localized (title, body) for a notification"""
+    title, body = _template(notification_type, translation.get_language())
+    return title, body.format(sender=sender_name)
+
+
+def action_data(notification_type, **ids):
+    """Navigation data stored on the notification and sent to the app"""
+    return {
+        'type': notification_type,
+        **ids,
+        'navigate_to': TEMPLATES[notification_type][2],
+    }
+
+
+def encode_action_data(data):
+    return json.dumps(data, separators=(',', ':'))
+
+
+@lru_cache(maxsize=1024)
+def _shared_parts(title, body, action_items):
+    """messaging.Notification and encoded action_data, shared by identical broadcast payloads"""
+    return get_messaging().Notification(title=title, body=body), encode_action_data(dict(action_items))
+
+
+class Payload:
+    """Rendered FCM content for one notification, reused for each of its tokens"""
+
+    def __init__(self, notification):
+        try:
+            fcm_notification, encoded = _shared_parts(
+                notification.title,
+                notification.message,
+                tuple(notification.action_data.items())
+            )
+        except TypeError:
+            # Nested (unhashable) action_data can't be cached
+            fcm_notification = get_messaging().Notification(title=notification.title, body=notification.message)
+            encoded = encode_action_data(notification.action_data)
+
+        self.notification = fcm_notification
+        self.data = {
+            'notification_id': str(notification.id),
+            'type': notification.notification_type,
+            'action_data': encoded,
+        }
+
+    def message(self, token):
+        return get_messaging().Message(notification=self.notification, data=self.data, token=token)
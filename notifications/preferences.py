@@ -0,0 +1,76 @@
+import logging
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.models import User
+from .models import NotificationPreference
+
+logger = logging.getLogger(__name__)
+
+
+def filter_recipients(recipient_ids, notification_type, post_id=None):
+    """
+    Drop recipients who disabled this notification type, muted the post or are
+    inactive, in a single query. Returns (deliver_now, deferred) where deferred
+    maps user ID -> aware datetime at which their quiet hours end.
+    """
+    type_bit = NotificationPreference.TYPE_BITS[notification_type]
+
+    recipients = User.objects.filter(id__in=recipient_ids, is_active=True).alias(
+        type_enabled=Coalesce(
+            F('notification_preference__enabled_types'),
+            Value(NotificationPreference.ALL_TYPES)
+        ).bitand(type_bit)
+    ).exclude(type_enabled=0)
+
+    if post_id is not None:
+        recipients = recipients.exclude(muted_posts__post_id=post_id)
+
+    now = timezone.now()
+    deliver_now = []
+    deferred = {}
+
+    for user_id, start, end, tz_name in recipients.values_list(
+        'id',
+        'notification_preference__quiet_hours_start',
+        'notification_preference__quiet_hours_end',
+        'notification_preference__timezone'
+    ):
+        release_at = quiet_hours_end(now, start, end, tz_name) if start and end else None
+        if release_at is None:
+            deliver_now.append(user_id)
+        else:
+            deferred[user_id] = release_at
+
+    return deliver_now, deferred
+
+
+def quiet_hours_end(now, start, end, tz_name):
+    """Return when the current quiet period ends, or None if now is outside quiet hours"""
+    if start == end:
+        return None
+    try:
+        tz = ZoneInfo(tz_name or 'UTC')
+    except ZoneInfoNotFoundError:
+        logger.warning(f"Unknown timezone {tz_name}, using UTC for quiet hours")
+        tz = ZoneInfo('UTC')
+
+    local_now = now.astimezone(tz)
+    current = local_now.time()
+
+    if start < end:
+        in_quiet_hours = start <= current < end
+    else:
+        # Overnight window, e.g. 22:00-07:00
+        in_quiet_hours = current >= start or current < end
+    if not in_quiet_hours:
+        return None
+
+    release = datetime.combine(local_now.date(), end, tzinfo=tz)
+    if release <= local_now:
+        release += timedelta(days=1)
+    return release
@@ -0,0 +1,213 @@
+"""
+Client delivery receipts and open tracking.
+
+The app posts batches of "received"/"opened" events. Each request becomes
+a single entry in a Redis stream. The apply_notification_receipts beat task
+reads entries through a consumer group and applies them with a few bulk
+UPDATE statements per batch, so receipt volume doesn't turn into one write
+per event. Entries are only acknowledged after they're applied, and ones
+left behind by a crashed worker are claimed again.
+"""
+import json
+import logging
+import os
+import socket
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.models import UserDevice
+from notification_backend.db_router import group_by_shard
+from notification_backend.redis_client import get_redis
+from .models import Notification, NotificationDelivery
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'notifications:receipts'
+GROUP = 'receipt-appliers'
+RECEIVED = 'received'
+OPENED = 'opened'
+
+# Entries unacknowledged for this long are assumed abandoned by a dead worker
+CLAIM_IDLE_MS = 60_000
+
+
+def enqueue(user_id, events, max_buffer):
+    """Buffer one request's events as a single stream entry"""
+    get_redis().xadd(
+        STREAM_KEY,
+        {'user_id': user_id, 'events': json.dumps(events, separators=(',', ':'), default=str)},
+        maxlen=max_buffer,
+        approximate=True
+    )
+
+
+def _ensure_group(client):
+    try:
+        client.xgroup_create(STREAM_KEY, GROUP, id='0', mkstream=True)
+    except redis.ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def _consumer_name():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def _read(client, count):
+    """
+    Return up to count (entry_id, fields) entries, reclaiming abandoned ones
+    first. The group is created on first use and again if it disappears, e.g.
+    after a flush or a failover to a replica that never saw it.
+    """
+    try:
+        return _read_group(client, count)
+    except redis.ResponseError as e:
+        if 'NOGROUP' not in str(e):
+            raise
+        _ensure_group(client)
+        return _read_group(client, count)
+
+
+def _read_group(client, count):
+    consumer = _consumer_name()
+    claimed = client.xautoclaim(STREAM_KEY, GROUP, consumer, CLAIM_IDLE_MS, start_id='0-0', count=count)
+    entries = [entry for entry in claimed[1] if entry[1]]
+    if len(entries) < count:
+        for _, stream_entries in client.xreadgroup(
+            GROUP, consumer, {STREAM_KEY: '>'}, count=count - len(entries)
+        ) or []:
+            entries.extend(stream_entries)
+    return entries
+
+
+def apply_pending(batch_size, max_batches):
+    """Apply buffered receipts in batches of batch_size stream entries; return rows updated"""
+    client = get_redis()
+    applied = 0
+
+    for _ in range(max_batches):
+        entries = _read(client, batch_size)
+        if not entries:
+            break
+
+        events = []
+        for _, fields in entries:
+            user_id = int(fields[b'user_id'])
+            events.extend((user_id, event) for event in json.loads(fields[b'events']))
+        applied += apply(events)
+
+        entry_ids = [entry_id for entry_id, _ in entries]
+        client.xack(STREAM_KEY, GROUP, *entry_ids)
+        client.xdel(STREAM_KEY, *entry_ids)
+
+    return applied
+
+
+def apply(events):
+    """
+    Apply (user_id, event) pairs in bulk. Events for notifications that don't
+    belong to the submitting user are ignored; the first receipt or open wins.
+    """
+    return sum(
+        _apply_shard(shard_events, alias)
+        for alias, shard_events in group_by_shard(events, lambda pair: pair[0]).items()
+    )
+
+
+def _apply_shard(events, using):
+    received = {}
+    opened = {}
+    for user_id, event in events:
+        timestamp = _timestamp(event.get('timestamp'))
+        key = (event['notification_id'], user_id)
+        if event['event'] == OPENED:
+            opened[key] = min(timestamp, opened.get(key, timestamp))
+            # An opened notification was necessarily received on that device
+            if event.get('device_id'):
+                received.setdefault((*key, event['device_id']), timestamp)
+        else:
+            received_key = (*key, event.get('device_id') or '')
+            received[received_key] = min(timestamp, received.get(received_key, timestamp))
+
+    return _apply_received(received, using) + _apply_opened(opened, using)
+
+
+def _timestamp(value):
+    now = timezone.now()
+    parsed = parse_datetime(value) if isinstance(value, str) else value
+    if not isinstance(parsed, datetime):
+        return now
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    # Don't trust client clocks that run ahead
+    return min(parsed, now)
+
+
+def _apply_received(received, using=None):
+    """received maps (notification_id, user_id, device_id or '') -> timestamp"""
+    if not received:
+        return 0
+    deliveries = list(NotificationDelivery.objects.using(using).filter(
+        notification_id__in={notification_id for notification_id, _, _ in received},
+        received_at__isnull=True
+    ).values_list('id', 'notification_id', 'notification__recipient_id', 'device_id'))
+
+    # Devices live on the primary, which may not be the notifications' database
+    device_ids = dict(
+        UserDevice.objects.filter(id__in={device_pk for _, _, _, device_pk in deliveries}).values_list(
+            'id', 'device_id'
+        )
+    )
+
+    stamps = {}
+    for delivery_id, notification_id, recipient_id, device_pk in deliveries:
+        device_id = device_ids.get(device_pk, '')
+        timestamp = received.get((notification_id, recipient_id, device_id)) or received.get(
+            (notification_id, recipient_id, '')
+        )
+        if timestamp is not None:
+            stamps[delivery_id] = timestamp
+    if not stamps:
+        return 0
+
+    return NotificationDelivery.objects.using(using).filter(id__in=stamps, received_at__isnull=True).update(
+        received_at=_case(stamps)
+    )
+
+
+def _apply_opened(opened, using=None):
+    """opened maps (notification_id, user_id) -> timestamp"""
+    if not opened:
+        return 0
+    owned = Notification.objects.using(using).filter(
+        id__in={notification_id for notification_id, _ in opened},
+        opened_at__isnull=True
+    ).values_list('id', 'recipient_id')
+
+    stamps = {
+        notification_id: opened[(notification_id, recipient_id)]
+        for notification_id, recipient_id in owned
+        if (notification_id, recipient_id) in opened
+    }
+    if not stamps:
+        return 0
+
+    opened_at = _case(stamps)
+    return Notification.objects.using(using).filter(id__in=stamps, opened_at__isnull=True).update(
+        opened_at=opened_at,
+        is_read=True,
+        read_at=Coalesce(F('read_at'), opened_at)
+    )
+
+
+def _case(stamps):
+    """CASE id WHEN ... THEN timestamp, to set per-row values in one UPDATE"""
+    return Case(
+        *[When(id=row_id, then=Value(timestamp)) for row_id, timestamp in stamps.items()],
+        output_field=DateTimeField()
+    )
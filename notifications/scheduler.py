@@ -0,0 +1,97 @@
+"""
+Deferred notification delivery.
+
+Pending deliveries are members "<notification_id>:<user_id>" of a Redis sorted
+set scored by their release timestamp. The release_scheduled_notifications
+beat task claims due members in batches and hands them to the normal delivery
+path, so deferring millions of pushes costs one small set entry each instead
+of one ETA task held in worker memory.
+
+Claimed members move to an in-flight set with a lease and are only dropped by
+ack() once their delivery task is queued; if queueing fails (or the releasing
+worker dies) they are claimed again when the lease runs out. schedule() is the
+entry point for any deferred delivery of an existing notification; quiet hours
+are currently its only caller.
+"""
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+from notification_backend.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_KEY = 'notifications:scheduled'
+IN_FLIGHT_KEY = 'notifications:scheduled:in-flight'
+
+# Atomically claim up to ARGV[2] members due at or before ARGV[1]: expired
+# in-flight leases first, then scheduled members, all leased until ARGV[3]
+_CLAIM_DUE_SCRIPT = """
+local limit = tonumber(ARGV[2])
+local due = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, limit)
+if #due < limit then
+    local fresh = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, limit - #due)
+    if #fresh > 0 then
+        redis.call('ZREM', KEYS[1], unpack(fresh))
+    end
+    for _, member in ipairs(fresh) do
+        due[#due + 1] = member
+    end
+end
+for _, member in ipairs(due) do
+    redis.call('ZADD', KEYS[2], ARGV[3], member)
+end
+return due
+"""
+
+
+def _member(notification_id, user_id):
+    return f'{notification_id}:{user_id}'
+
+
+def schedule(entries):
+    """
+    Queue deliveries for later. entries is an iterable of
+    (notification_id, user_id, send_at) with aware datetimes.
+    """
+    members = {
+        _member(notification_id, user_id): send_at.timestamp()
+        for notification_id, user_id, send_at in entries
+    }
+    if members:
+        get_redis().zadd(SCHEDULE_KEY, members)
+    return len(members)
+
+
+def claim_due(limit, now=None):
+    """
+    Claim and return up to limit due (notification_id, user_id) pairs. They
+    are released again after NOTIFICATION_SCHEDULER_LEASE_SECONDS unless
+    acknowledged with ack().
+    """
+    now = now or time.time()
+    due = get_redis().eval(
+        _CLAIM_DUE_SCRIPT, 2, SCHEDULE_KEY, IN_FLIGHT_KEY,
+        now, limit, now + settings.NOTIFICATION_SCHEDULER_LEASE_SECONDS
+    )
+    pairs = []
+    for member in due:
+        notification_id, user_id = member.decode().split(':')
+        pairs.append((int(notification_id), int(user_id)))
+    return pairs
+
+
+def ack(pairs):
+    """Drop claimed pairs once their delivery has been queued"""
+    if pairs:
+        get_redis().zrem(IN_FLIGHT_KEY, *[_member(notification_id, user_id) for notification_id, user_id in pairs])
+
+
+def pending_count():
+    try:
+        return sum(get_redis().pipeline().zcard(SCHEDULE_KEY).zcard(IN_FLIGHT_KEY).execute())
+    except redis.RedisError as e:
+        logger.warning(f"Could not read scheduled notification count: {e}")
+        return None
@@ -1,10 +1,21 @@
 from rest_framework import serializers
-from .models import Notification
-from accounts.serializers import UserProfileSerializer
+from drf_spectacular.utils import extend_schema_field
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from .models import Notification, NotificationPreference
+from accounts.serializers import UserSummarySerializer
+
+
+def sender_snapshot(user):
+    """
+    Profile data stored on new notifications as Notification.sender_snapshot.
+    Snapshots are never refreshed: a notification shows the sender as they
+    were when it was sent, and profile edits don't rewrite past notifications.
+    """
+    return dict(UserSummarySerializer(user).data)
 
 
 class NotificationSerializer(serializers.ModelSerializer):
-    sender = UserProfileSerializer(read_only=True)
+    sender = serializers.SerializerMethodField()
     
     class Meta:
         model = Notification
@@ -16,3 +27,70 @@ class NotificationSerializer(serializers.ModelSerializer):
             'id', 'sender', 'notification_type', 'title', 'message',
             'action_data', 'created_at', 'read_at'
         )
+    
+    @extend_schema_field(UserSummarySerializer)
+    def get_sender(self, obj):
+        if not obj.sender_snapshot:
+            # Rows written without a snapshot (bulk writes outside the fan-out tasks)
+            return UserSummarySerializer(obj.sender, context=self.context).data
+        sender = dict(obj.sender_snapshot)
+        request = self.context.get('request')
+        # Snapshots hold storage URLs; make them absolute like ImageField does
+        for field in ('profile_picture', 'profile_thumbnail'):
+            if request is not None and sender.get(field):
+                sender[field] = request.build_absolute_uri(sender[field])
+        return sender
+
+
+class NotificationBatchActionSerializer(serializers.Serializer):
+    ACTIONS = ('read', 'unread')
+    
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500
+    )
+    action = serializers.ChoiceField(choices=ACTIONS, default='read')
+
+
+class NotificationReceiptSerializer(serializers.Serializer):
+    EVENTS = ('received', 'opened')
+    
+    notification_id = serializers.IntegerField(min_value=1)
+    event = serializers.ChoiceField(choices=EVENTS)
+    device_id = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    timestamp = serializers.DateTimeField(required=False)
+
+
+class NotificationReceiptBatchSerializer(serializers.Serializer):
+    events = serializers.ListField(
+        child=NotificationReceiptSerializer(),
+        allow_empty=False,
+        max_length=500
+    )
+
+
+class NotificationPreferenceSerializer(serializers.ModelSerializer):
+    enabled_types = serializers.MultipleChoiceField(
+        choices=Notification.NOTIFICATION_TYPES,
+        source='enabled_type_names'
+    )
+    
+    class Meta:
+        model = NotificationPreference
+        fields = ('enabled_types', 'quiet_hours_start', 'quiet_hours_end', 'timezone', 'updated_at')
+        read_only_fields = ('updated_at',)
+    
+    def validate_timezone(self, value):
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError('Unknown timezone.')
+        return value
+    
+    def validate(self, attrs):
+        start = attrs.get('quiet_hours_start', getattr(self.instance, 'quiet_hours_start', None))
+        end = attrs.get('quiet_hours_end', getattr(self.instance, 'quiet_hours_end', None))
+        if (start is None) != (end is None):
+            raise serializers.ValidationError('Set both quiet_hours_start and quiet_hours_end, or neither.')
+        return attrs
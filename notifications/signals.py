@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import User, UserDevice
+from posts.models import Comment, Post
+from . import audiences
+from .models import Notification, NotificationDelivery
+
+
+@receiver(post_save, sender=User)
+def update_audiences_on_user_save(sender, instance, **kwargs):
+    if instance.is_active:
+        transaction.on_commit(lambda: audiences.add_user(instance.id))
+    else:
+        transaction.on_commit(lambda: audiences.remove_user(instance.id))
+
+
+@receiver(post_delete, sender=User)
+def update_audiences_on_user_delete(sender, instance, **kwargs):
+    # Deleted instances lose their pk, so bind it now
+    user_id = instance.id
+    transaction.on_commit(lambda: audiences.remove_user(user_id))
+
+
+@receiver(post_save, sender=UserDevice)
+@receiver(post_delete, sender=UserDevice)
+def update_audiences_on_device_change(sender, instance, **kwargs):
+    transaction.on_commit(lambda: audiences.sync_user_devices(instance.user_id))
+
+
+def _delete_on_shards(model, **lookups):
+    """Cascade deletes from the primary to notification shards, which have no FK constraints"""
+    for alias in settings.NOTIFICATION_SHARDS:
+        for field, value in lookups.items():
+            model.objects.using(alias).filter(**{field: value}).delete()
+
+
+@receiver(post_delete, sender=User)
+def delete_sharded_notifications_of_user(sender, instance, **kwargs):
+    if settings.NOTIFICATION_SHARDS:
+        # Deleted instances lose their pk, so bind it now
+        user_id = instance.id
+        transaction.on_commit(lambda: _delete_on_shards(Notification, recipient_id=user_id, sender_id=user_id))
+
+
+@receiver(post_delete, sender=Post)
+def delete_sharded_notifications_of_post(sender, instance, **kwargs):
+    if settings.NOTIFICATION_SHARDS:
+        post_id = instance.id
+        transaction.on_commit(lambda: _delete_on_shards(Notification, post_id=post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def delete_sharded_notifications_of_comment(sender, instance, **kwargs):
+    if settings.NOTIFICATION_SHARDS:
+        comment_id = instance.id
+        transaction.on_commit(lambda: _delete_on_shards(Notification, comment_id=comment_id))
+
+
+@receiver(post_delete, sender=UserDevice)
+def delete_sharded_deliveries_of_device(sender, instance, **kwargs):
+    if settings.NOTIFICATION_SHARDS:
+        device_id = instance.id
+        transaction.on_commit(lambda: _delete_on_shards(NotificationDelivery, device_id=device_id))
@@ -1,93 +1,160 @@
-import firebase_admin
-from firebase_admin import credentials, messaging
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from celery import shared_task
-from pathlib import Path
+from kombu.exceptions import OperationalError
+from notification_backend.db_router import group_by_shard
 from .models import Notification, NotificationDelivery
-from accounts.models import User, UserDevice
-from posts.models import Post, Comment
+from .serializers import sender_snapshot
+from . import audiences, payloads, preferences, receipts, scheduler, token_hygiene, transport
+from accounts.models import UserDevice
+from posts.models import Post, Comment, PostParticipant
 import logging
+import redis
+from datetime import datetime, timezone as dt_timezone
 
 logger = logging.getLogger(__name__)
 
-# Initialize Firebase Admin SDK
-if not firebase_admin._apps:
-    if settings.FIREBASE_CREDENTIALS_PATH and Path(settings.FIREBASE_CREDENTIALS_PATH).exists():
-        try:
-            cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
-            firebase_admin.initialize_app(cred)
-            logger.info("Firebase Admin SDK initialized successfully")
-        except Exception as e:
-            logger.warning(f"Failed to initialize Firebase: {e}")
-    else:
-        logger.warning("Firebase credentials not configured or file not found")
-
 
 @shared_task
-def send_post_notification(post_id):
-    """Send notification to all users when a new post is created"""
+def send_post_notification(post_id, audience=audiences.ALL):
+    """Send notification to an audience (all users by default) when a new post is created"""
     try:
-        post = Post.objects.get(id=post_id)
+        post = Post.objects.select_related('author').get(id=post_id)
         
-        # Get all users except the post author
-        recipients = User.objects.filter(is_active=True).exclude(id=post.author.id)
+        # Render the content once for the whole broadcast
+        title, message = payloads.render('new_post', post.author.get_full_name())
+        action_data = payloads.action_data('new_post', post_id=post.id)
         
-        for recipient in recipients:
-            # Create notification record
-            notification = Notification.objects.create(
-                recipient=recipient,
-                sender=post.author,
-                notification_type='new_post',
-                title='New Post',
-                message=f"{post.author.get_full_name()} posted something new",
-                post=post,
-                action_data={
-                    'type': 'new_post',
-                    'post_id': post.id,
-                    'navigate_to': 'post_detail'
-                }
+        # Stream recipients from the precomputed audience, excluding the post author
+        for recipient_ids in audiences.iter_recipient_ids(
+            audience,
+            exclude={post.author_id},
+            batch_size=settings.NOTIFICATION_BULK_BATCH_SIZE
+        ):
+            _create_notifications(
+                'new_post', post.author, title, message, action_data, recipient_ids, post.id
             )
             
-            # Send to all active devices
-            send_notification_to_user.delay(notification.id, recipient.id)
-            
     except Post.DoesNotExist:
         logger.error(f"Post {post_id} not found")
     except Exception as e:
         logger.error(f"Error sending post notification: {str(e)}")
 
 
+def _create_notifications(notification_type, sender, title, message, action_data, recipient_ids,
+                          post_id, comment_id=None):
+    """Create one batch of identical notifications in a single write transaction per shard"""
+    # Drop opted-out and muted recipients before any rows are written
+    deliver_now, deferred = preferences.filter_recipients(recipient_ids, notification_type, post_id)
+    if not deliver_now and not deferred:
+        return
+    
+    snapshot = sender_snapshot(sender)
+    pairs = []
+    for alias, shard_recipient_ids in group_by_shard([*deliver_now, *deferred], lambda user_id: user_id).items():
+        with transaction.atomic(using=alias):
+            notifications = Notification.objects.using(alias).bulk_create([
+                Notification(
+                    recipient_id=recipient_id,
+                    sender_id=sender.id,
+                    sender_snapshot=snapshot,
+                    notification_type=notification_type,
+                    title=title,
+                    message=message,
+                    post_id=post_id,
+                    comment_id=comment_id,
+                    action_data=action_data
+                )
+                for recipient_id in shard_recipient_ids
+            ])
+        pairs.extend((notification.id, notification.recipient_id) for notification in notifications)
+    
+    # Send to all active devices, holding back recipients in quiet hours
+    _dispatch(pairs, deferred)
+
+
+def _dispatch(pairs, deferred):
+    """Queue immediate sends in delivery batches and hand deferred ones to the scheduler"""
+    now = []
+    later = []
+    for notification_id, user_id in pairs:
+        send_at = deferred.get(user_id)
+        if send_at is None:
+            now.append((notification_id, user_id))
+        else:
+            later.append((notification_id, user_id, send_at))
+    
+    for batch in _chunks(now, settings.NOTIFICATION_DELIVERY_BATCH_SIZE):
+        send_notifications_batch.delay(batch)
+    
+    if later:
+        try:
+            scheduler.schedule(later)
+        except redis.RedisError as e:
+            # Never hold hours-long ETA tasks in the broker: retry the scheduling instead
+            logger.warning(f"Scheduler unavailable, retrying shortly: {e}")
+            schedule_deferred_notifications.delay([
+                (notification_id, user_id, send_at.timestamp())
+                for notification_id, user_id, send_at in later
+            ])
+
+
+@shared_task(
+    autoretry_for=(redis.RedisError,),
+    max_retries=None,
+    retry_backoff=True,
+    retry_backoff_max=600
+)
+def schedule_deferred_notifications(entries):
+    """Hand (notification_id, user_id, release timestamp) entries to the scheduler once Redis is back"""
+    scheduler.schedule(
+        (notification_id, user_id, datetime.fromtimestamp(send_at, dt_timezone.utc))
+        for notification_id, user_id, send_at in entries
+    )
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
 @shared_task
 def send_comment_notification(comment_id):
-    """Send notification to post author when someone comments"""
+    """Notify the post author and everyone else who commented on the post"""
     try:
-        comment = Comment.objects.get(id=comment_id)
-        post_author = comment.post.author
+        comment = Comment.objects.select_related('post', 'author').get(id=comment_id)
+        post = comment.post
+        sender_name = comment.author.get_full_name()
+        action_data = payloads.action_data('new_comment', post_id=post.id, comment_id=comment.id)
         
         # Don't send notification if user comments on their own post
-        if comment.author == post_author:
-            return
+        if comment.author_id != post.author_id:
+            title, message = payloads.render('new_comment', sender_name)
+            _create_notifications(
+                'new_comment', comment.author, title, message, action_data,
+                [post.author_id], post.id, comment.id
+            )
         
-        # Create notification record
-        notification = Notification.objects.create(
-            recipient=post_author,
-            sender=comment.author,
-            notification_type='new_comment',
-            title='New Comment',
-            message=f"{comment.author.get_full_name()} commented on your post",
-            post=comment.post,
-            comment=comment,
-            action_data={
-                'type': 'new_comment',
-                'post_id': comment.post.id,
-                'comment_id': comment.id,
-                'navigate_to': 'comment_detail'
-            }
-        )
+        # Other participants of the thread, read in user ID order from the participant table
+        title, message = payloads.render('thread_comment', sender_name)
+        action_data = {**action_data, 'type': 'thread_comment'}
+        participants = PostParticipant.objects.filter(post_id=post.id).exclude(
+            user_id__in={comment.author_id, post.author_id}
+        ).order_by('user_id').values_list('user_id', flat=True)
+        last_user_id = 0
         
-        # Send to all active devices
-        send_notification_to_user.delay(notification.id, post_author.id)
+        while True:
+            recipient_ids = list(
+                participants.filter(user_id__gt=last_user_id)[:settings.NOTIFICATION_BULK_BATCH_SIZE]
+            )
+            if not recipient_ids:
+                break
+            last_user_id = recipient_ids[-1]
+            _create_notifications(
+                'thread_comment', comment.author, title, message, action_data,
+                recipient_ids, post.id, comment.id
+            )
         
     except Comment.DoesNotExist:
         logger.error(f"Comment {comment_id} not found")
@@ -95,83 +162,193 @@ def send_comment_notification(comment_id):
         logger.error(f"Error sending comment notification: {str(e)}")
 
 
-@shared_task
+# Delivery tasks skip devices already delivered, so they are acknowledged only after running
+# and redelivered if a worker dies mid-batch. Fan-out tasks would create duplicates and ack early.
+@shared_task(acks_late=True, reject_on_worker_lost=True)
 def send_notification_to_user(notification_id, user_id):
     """Send FCM notification to all active devices of a user"""
+    return send_notifications_batch([(notification_id, user_id)])
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True, compression='zlib')
+def send_notifications_batch(pairs):
+    """
+    Send FCM notifications for many (notification_id, user_id) pairs at once.
+    Notifications and devices are loaded in two queries (per shard), missing
+    delivery rows are bulk-created and all tokens are sent in send_each calls
+    of up to 500.
+    """
     try:
-        notification = Notification.objects.get(id=notification_id)
-        user = User.objects.get(id=user_id)
-        
-        # Get all active devices for the user
-        devices = UserDevice.objects.filter(user=user, is_active=True)
+        devices_by_user = {}
+        for device in UserDevice.objects.filter(
+            user_id__in={user_id for _, user_id in pairs},
+            is_active=True
+        ).only('id', 'user_id', 'fcm_token'):
+            devices_by_user.setdefault(device.user_id, []).append(device)
         
-        if not devices.exists():
-            logger.info(f"No active devices found for user {user.phone_number}")
-            return
+        # Notification IDs are only unique within a shard, so everything below is keyed by alias
+        pending = []
+        for alias, shard_pairs in group_by_shard(pairs, lambda pair: pair[1]).items():
+            notifications = Notification.objects.using(alias).in_bulk(
+                {notification_id for notification_id, _ in shard_pairs}
+            )
+            targets = [
+                (notifications[notification_id], device)
+                for notification_id, user_id in shard_pairs
+                if notification_id in notifications
+                for device in devices_by_user.get(user_id, [])
+            ]
+            deliveries = _delivery_rows(targets, alias)
+            pending.extend(
+                (alias, notification, device, deliveries[(notification.id, device.id)])
+                for notification, device in targets
+                if not deliveries[(notification.id, device.id)].is_delivered
+            )
+        if not pending:
+            logger.info(f"No undelivered devices found for {len(pairs)} notifications")
+            return 0
         
-        # Prepare FCM message
-        fcm_message_data = {
-            'title': notification.title,
-            'body': notification.message,
-            'data': {
-                'notification_id': str(notification.id),
-                'type': notification.notification_type,
-                'action_data': str(notification.action_data)
-            }
-        }
+        # Firebase is initialized on the first send in this process
+        messaging = transport.get_messaging()
+        payloads_by_id = {}
         
-        successful_deliveries = 0
+        delivered_ids = {}
+        sent_notification_ids = {}
+        failed = {}
+        invalid_devices = {}
         
-        for device in devices:
+        for batch in _chunks(pending, token_hygiene.FCM_MAX_BATCH):
+            messages = []
+            for alias, notification, device, _ in batch:
+                payload = payloads_by_id.get((alias, notification.id))
+                if payload is None:
+                    payload = payloads_by_id[(alias, notification.id)] = payloads.Payload(notification)
+                messages.append(payload.message(device.fcm_token))
+            
             try:
-                # Create delivery record
-                delivery, created = NotificationDelivery.objects.get_or_create(
-                    notification=notification,
-                    device=device
-                )
-                
-                if not created and delivery.is_delivered:
-                    continue  # Already delivered
-                
-                # Send FCM message
-                message = messaging.Message(
-                    notification=messaging.Notification(
-                        title=fcm_message_data['title'],
-                        body=fcm_message_data['body']
-                    ),
-                    data=fcm_message_data['data'],
-                    token=device.fcm_token
-                )
-                
-                response = messaging.send(message)
-                
-                # Update delivery status
-                delivery.is_delivered = True
-                delivery.delivered_at = timezone.now()
-                delivery.save()
-                
-                successful_deliveries += 1
-                logger.info(f"Notification sent successfully to {device.fcm_token}: {response}")
-                
-            except messaging.UnregisteredError:
-                # Token is invalid, deactivate device
-                device.is_active = False
-                device.save()
-                delivery.error_message = "Invalid FCM token"
-                delivery.save()
-                logger.warning(f"Invalid FCM token for device {device.id}, deactivated")
-                
+                responses = messaging.send_each(messages).responses
             except Exception as e:
-                delivery.error_message = str(e)
-                delivery.save()
-                logger.error(f"Error sending notification to device {device.id}: {str(e)}")
-        
-        # Update notification status
-        if successful_deliveries > 0:
-            notification.is_sent = True
-            notification.save()
+                logger.error(f"Error sending batch of {len(messages)} notifications: {str(e)}")
+                for alias, _, _, delivery in batch:
+                    delivery.error_message = str(e)
+                    failed.setdefault(alias, []).append(delivery)
+                continue
             
-    except (Notification.DoesNotExist, User.DoesNotExist) as e:
-        logger.error(f"Notification or User not found: {str(e)}")
+            for (alias, notification, device, delivery), result in zip(batch, responses):
+                if result.success:
+                    delivered_ids.setdefault(alias, []).append(delivery.id)
+                    sent_notification_ids.setdefault(alias, set()).add(notification.id)
+                elif isinstance(result.exception, messaging.UnregisteredError):
+                    # Token is invalid, deactivate device
+                    delivery.error_message = "Invalid FCM token"
+                    failed.setdefault(alias, []).append(delivery)
+                    invalid_devices[device.id] = device.user_id
+                else:
+                    delivery.error_message = str(result.exception)
+                    failed.setdefault(alias, []).append(delivery)
+        
+        # Apply all status changes in a handful of bulk queries per shard
+        for alias, ids in delivered_ids.items():
+            NotificationDelivery.objects.using(alias).filter(id__in=ids).update(
+                is_delivered=True,
+                delivered_at=timezone.now()
+            )
+            Notification.objects.using(alias).filter(
+                id__in=sent_notification_ids[alias],
+                is_sent=False
+            ).update(is_sent=True)
+        for alias, deliveries in failed.items():
+            NotificationDelivery.objects.using(alias).bulk_update(deliveries, ['error_message'], batch_size=500)
+        if invalid_devices:
+            UserDevice.objects.filter(id__in=invalid_devices).update(is_active=False, updated_at=timezone.now())
+            for user_id in set(invalid_devices.values()):
+                audiences.sync_user_devices(user_id)
+            logger.warning(f"Deactivated {len(invalid_devices)} devices with invalid FCM tokens")
+        
+        delivered = sum(len(ids) for ids in delivered_ids.values())
+        logger.info(f"Sent {delivered}/{len(pending)} notifications to devices")
+        return delivered
+        
     except Exception as e:
-        logger.error(f"Error in send_notification_to_user: {str(e)}")
+        logger.error(f"Error in send_notifications_batch: {str(e)}")
+
+
+def _delivery_rows(targets, using=None):
+    """Return {(notification_id, device_id): delivery}, bulk-creating missing rows"""
+    if not targets:
+        return {}
+    deliveries_on_shard = NotificationDelivery.objects.using(using).only(
+        'id', 'notification_id', 'device_id', 'is_delivered'
+    )
+    deliveries = {
+        (delivery.notification_id, delivery.device_id): delivery
+        for delivery in deliveries_on_shard.filter(
+            notification_id__in={notification.id for notification, _ in targets},
+            device_id__in={device.id for _, device in targets}
+        )
+    }
+    
+    missing = [
+        NotificationDelivery(notification=notification, device=device)
+        for notification, device in targets
+        if (notification.id, device.id) not in deliveries
+    ]
+    if missing:
+        with transaction.atomic(using=using):
+            NotificationDelivery.objects.using(using).bulk_create(missing, batch_size=500, ignore_conflicts=True)
+        # ignore_conflicts doesn't return primary keys, so read the new rows back
+        deliveries.update(
+            ((delivery.notification_id, delivery.device_id), delivery)
+            for delivery in deliveries_on_shard.filter(
+                notification_id__in={delivery.notification_id for delivery in missing},
+                device_id__in={delivery.device_id for delivery in missing}
+            )
+        )
+    return deliveries
+
+
+@shared_task
+def release_scheduled_notifications():
+    """Release due scheduled notifications into the delivery path in batches"""
+    released = 0
+    try:
+        for _ in range(settings.NOTIFICATION_SCHEDULER_MAX_BATCHES):
+            pairs = scheduler.claim_due(settings.NOTIFICATION_SCHEDULER_BATCH_SIZE)
+            if not pairs:
+                break
+            for batch in _chunks(pairs, settings.NOTIFICATION_DELIVERY_BATCH_SIZE):
+                send_notifications_batch.delay(batch)
+                # Unacknowledged pairs are claimed again once their lease runs out
+                scheduler.ack(batch)
+                released += len(batch)
+    except (redis.RedisError, OperationalError) as e:
+        logger.error(f"Error releasing scheduled notifications: {str(e)}")
+    
+    if released:
+        logger.info(f"Released {released} scheduled notifications")
+    return released
+
+
+@shared_task
+def apply_notification_receipts():
+    """Apply buffered client receipts and opens with bulk updates"""
+    try:
+        updated = receipts.apply_pending(
+            settings.NOTIFICATION_RECEIPTS_BATCH_SIZE,
+            settings.NOTIFICATION_RECEIPTS_MAX_BATCHES
+        )
+    except redis.RedisError as e:
+        logger.error(f"Error applying notification receipts: {str(e)}")
+        return 0
+    
+    if updated:
+        logger.info(f"Applied {updated} notification receipts")
+    return updated
+
+
+@shared_task
+def prune_device_tokens():
+    """Validate, expire and purge FCM device tokens"""
+    report = token_hygiene.run()
+    logger.info(f"Device token hygiene: {report}")
+    return report
@@ -1 +1,274 @@
-# notifications/tests.py
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User, UserDevice
+from posts.models import Post
+from . import preferences, receipts
+from .models import MutedPost, Notification, NotificationDelivery, NotificationPreference
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class QuietHoursEndTests(SimpleTestCase):
+    def test_daytime_window(self):
+        start, end = time(9), time(17)
+
+        self.assertEqual(preferences.quiet_hours_end(_utc(2026, 3, 2, 12), start, end, 'UTC'), _utc(2026, 3, 2, 17))
+        self.assertIsNone(preferences.quiet_hours_end(_utc(2026, 3, 2, 17), start, end, 'UTC'))
+        self.assertIsNone(preferences.quiet_hours_end(_utc(2026, 3, 2, 8, 59), start, end, 'UTC'))
+
+    def test_overnight_window_before_midnight_ends_the_next_day(self):
+        release = preferences.quiet_hours_end(_utc(2026, 3, 2, 23, 30), time(22), time(7), 'UTC')
+
+        self.assertEqual(release, _utc(2026, 3, 3, 7))
+
+    def test_overnight_window_after_midnight_ends_the_same_day(self):
+        release = preferences.quiet_hours_end(_utc(2026, 3, 3, 3), time(22), time(7), 'UTC')
+
+        self.assertEqual(release, _utc(2026, 3, 3, 7))
+
+    def test_outside_an_overnight_window(self):
+        self.assertIsNone(preferences.quiet_hours_end(_utc(2026, 3, 3, 12), time(22), time(7), 'UTC'))
+
+    def test_equal_start_and_end_means_no_quiet_hours(self):
+        self.assertIsNone(preferences.quiet_hours_end(_utc(2026, 3, 3, 12), time(12), time(12), 'UTC'))
+
+    def test_window_is_in_the_users_timezone(self):
+        # 03:00 UTC is 22:00 the previous evening in New York (EST)
+        release = preferences.quiet_hours_end(_utc(2026, 1, 15, 3), time(21), time(6), 'America/New_York')
+
+        self.assertEqual(release, datetime(2026, 1, 15, 6, tzinfo=ZoneInfo('America/New_York')))
+
+    def test_unknown_timezone_falls_back_to_utc(self):
+        with self.assertLogs('notifications.preferences', 'WARNING'):
+            release = preferences.quiet_hours_end(_utc(2026, 3, 3, 23), time(22), time(7), 'Mars/Olympus_Mons')
+
+        self.assertEqual(release, _utc(2026, 3, 4, 7))
+
+
+class FilterRecipientsTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(phone_number=f'+1555030000{index}', password='password') for index in range(3)
+        ]
+        self.post = Post.objects.create(author=self.users[0], content='Hello')
+
+    def _ids(self):
+        return [user.id for user in self.users]
+
+    def test_users_without_preferences_get_everything(self):
+        deliver_now, deferred = preferences.filter_recipients(self._ids(), 'new_post', self.post.id)
+
+        self.assertCountEqual(deliver_now, self._ids())
+        self.assertEqual(deferred, {})
+
+    def test_disabled_type_is_dropped(self):
+        NotificationPreference.objects.create(
+            user=self.users[1],
+            enabled_types=NotificationPreference.ALL_TYPES & ~NotificationPreference.TYPE_BITS['new_post']
+        )
+
+        new_post, _ = preferences.filter_recipients(self._ids(), 'new_post')
+        new_comment, _ = preferences.filter_recipients(self._ids(), 'new_comment')
+
+        self.assertCountEqual(new_post, [self.users[0].id, self.users[2].id])
+        self.assertCountEqual(new_comment, self._ids())
+
+    def test_muted_post_is_dropped(self):
+        MutedPost.objects.create(user=self.users[2], post=self.post)
+        other_post = Post.objects.create(author=self.users[0], content='Another one')
+
+        muted, _ = preferences.filter_recipients(self._ids(), 'new_comment', self.post.id)
+        other, _ = preferences.filter_recipients(self._ids(), 'new_comment', other_post.id)
+
+        self.assertCountEqual(muted, [self.users[0].id, self.users[1].id])
+        self.assertCountEqual(other, self._ids())
+
+    def test_inactive_users_are_dropped(self):
+        User.objects.filter(id=self.users[0].id).update(is_active=False)
+
+        deliver_now, _ = preferences.filter_recipients(self._ids(), 'new_post')
+
+        self.assertCountEqual(deliver_now, [self.users[1].id, self.users[2].id])
+
+    def test_recipients_in_quiet_hours_are_deferred(self):
+        NotificationPreference.objects.create(
+            user=self.users[0], quiet_hours_start=time(22), quiet_hours_end=time(7), timezone='UTC'
+        )
+
+        with mock.patch('notifications.preferences.timezone.now', return_value=_utc(2026, 3, 2, 23)):
+            deliver_now, deferred = preferences.filter_recipients(self._ids(), 'new_post')
+
+        self.assertCountEqual(deliver_now, [self.users[1].id, self.users[2].id])
+        self.assertEqual(deferred, {self.users[0].id: _utc(2026, 3, 3, 7)})
+
+
+class BatchNotificationActionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+15550400001', password='password')
+        self.other = User.objects.create_user(phone_number='+15550400002', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _notifications(self, recipient, count, is_read=False):
+        return [
+            Notification.objects.create(
+                recipient=recipient, sender=self.other, notification_type='new_post',
+                title='New post', message='Hello', is_read=is_read
+            )
+            for _ in range(count)
+        ]
+
+    def _batch(self, ids, action):
+        return self.client.post(
+            reverse('batch-notification-action'), {'ids': ids, 'action': action}, format='json'
+        )
+
+    def test_mark_read_counts(self):
+        unread = self._notifications(self.user, 3)
+        already_read = self._notifications(self.user, 1, is_read=True)
+
+        response = self._batch([unread[0].id, unread[1].id, already_read[0].id, 999999], 'read')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'requested': 4, 'updated': 2, 'unread_count': 1})
+        unread[0].refresh_from_db()
+        self.assertTrue(unread[0].is_read)
+        self.assertIsNotNone(unread[0].read_at)
+
+    def test_mark_unread_counts(self):
+        read = self._notifications(self.user, 2, is_read=True)
+        unread = self._notifications(self.user, 1)
+
+        response = self._batch([read[0].id, unread[0].id, read[0].id], 'unread')
+
+        self.assertEqual(response.data, {'requested': 2, 'updated': 1, 'unread_count': 2})
+        read[0].refresh_from_db()
+        self.assertEqual((read[0].is_read, read[0].read_at), (False, None))
+
+    def test_other_users_notifications_are_not_changed(self):
+        own = self._notifications(self.user, 1)
+        others_unread = self._notifications(self.other, 2)
+        others_read = self._notifications(self.other, 1, is_read=True)
+
+        read_response = self._batch([own[0].id, *(n.id for n in others_unread)], 'read')
+        unread_response = self._batch([others_read[0].id], 'unread')
+
+        self.assertEqual(read_response.data, {'requested': 3, 'updated': 1, 'unread_count': 0})
+        self.assertEqual(unread_response.data, {'requested': 1, 'updated': 0, 'unread_count': 0})
+        self.assertEqual(Notification.objects.filter(recipient=self.other, is_read=False).count(), 2)
+        self.assertTrue(Notification.objects.get(id=others_read[0].id).is_read)
+
+    def test_invalid_requests_are_rejected(self):
+        self.assertEqual(self._batch([], 'read').status_code, 400)
+        self.assertEqual(self._batch([1], 'archive').status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertEqual(self._batch([1], 'read').status_code, 401)
+
+
+class ReceiptTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+15550500001', password='password')
+        self.other = User.objects.create_user(phone_number='+15550500002', password='password')
+        self.notification = Notification.objects.create(
+            recipient=self.user, sender=self.other, notification_type='new_post', title='New post', message='Hello'
+        )
+        self.phone = UserDevice.objects.create(user=self.user, fcm_token='token-1', device_id='phone-1')
+        self.tablet = UserDevice.objects.create(user=self.user, fcm_token='token-2', device_id='tablet-1')
+        self.phone_delivery = NotificationDelivery.objects.create(notification=self.notification, device=self.phone)
+        self.tablet_delivery = NotificationDelivery.objects.create(notification=self.notification, device=self.tablet)
+        self.earlier = _utc(2026, 3, 2, 12)
+        self.later = _utc(2026, 3, 2, 13)
+
+    def _event(self, event, timestamp, device_id='phone-1'):
+        return {
+            'notification_id': self.notification.id, 'event': event,
+            'device_id': device_id, 'timestamp': timestamp.isoformat()
+        }
+
+    def test_received_is_stamped_on_the_reporting_device_only(self):
+        updated = receipts._apply_received({(self.notification.id, self.user.id, 'phone-1'): self.earlier})
+
+        self.assertEqual(updated, 1)
+        self.phone_delivery.refresh_from_db()
+        self.tablet_delivery.refresh_from_db()
+        self.assertEqual(self.phone_delivery.received_at, self.earlier)
+        self.assertIsNone(self.tablet_delivery.received_at)
+
+    def test_received_without_device_stamps_every_delivery(self):
+        updated = receipts._apply_received({(self.notification.id, self.user.id, ''): self.earlier})
+
+        self.assertEqual(updated, 2)
+
+    def test_receipts_for_another_users_notification_are_ignored(self):
+        received = receipts._apply_received({(self.notification.id, self.other.id, 'phone-1'): self.earlier})
+        opened = receipts._apply_opened({(self.notification.id, self.other.id): self.earlier})
+
+        self.assertEqual((received, opened), (0, 0))
+        self.notification.refresh_from_db()
+        self.phone_delivery.refresh_from_db()
+        self.assertIsNone(self.notification.opened_at)
+        self.assertFalse(self.notification.is_read)
+        self.assertIsNone(self.phone_delivery.received_at)
+
+    def test_opened_marks_the_notification_read(self):
+        updated = receipts._apply_opened({(self.notification.id, self.user.id): self.earlier})
+
+        self.assertEqual(updated, 1)
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.opened_at, self.earlier)
+        self.assertEqual((self.notification.is_read, self.notification.read_at), (True, self.earlier))
+
+    def test_opened_keeps_an_earlier_read_at(self):
+        read_at = _utc(2026, 3, 2, 11)
+        Notification.objects.filter(id=self.notification.id).update(is_read=True, read_at=read_at)
+
+        receipts._apply_opened({(self.notification.id, self.user.id): self.earlier})
+
+        self.notification.refresh_from_db()
+        self.assertEqual((self.notification.opened_at, self.notification.read_at), (self.earlier, read_at))
+
+    def test_earliest_timestamp_in_a_batch_wins(self):
+        receipts.apply([
+            (self.user.id, self._event('received', self.later)),
+            (self.user.id, self._event('received', self.earlier)),
+            (self.user.id, self._event('opened', self.later)),
+            (self.user.id, self._event('opened', self.earlier)),
+        ])
+
+        self.notification.refresh_from_db()
+        self.phone_delivery.refresh_from_db()
+        self.assertEqual(self.notification.opened_at, self.earlier)
+        self.assertEqual(self.phone_delivery.received_at, self.earlier)
+
+    def test_first_applied_receipt_is_kept(self):
+        receipts.apply([(self.user.id, self._event('opened', self.later))])
+        updated = receipts.apply([(self.user.id, self._event('opened', self.earlier))])
+
+        self.assertEqual(updated, 0)
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.opened_at, self.later)
+
+    def test_opened_implies_received_on_that_device(self):
+        receipts.apply([(self.user.id, self._event('opened', self.earlier, device_id='tablet-1'))])
+
+        self.tablet_delivery.refresh_from_db()
+        self.phone_delivery.refresh_from_db()
+        self.assertEqual(self.tablet_delivery.received_at, self.earlier)
+        self.assertIsNone(self.phone_delivery.received_at)
+
+    def test_future_timestamps_are_clamped_to_now(self):
+        before = timezone.now()
+        receipts.apply([(self.user.id, self._event('opened', before + timedelta(days=1)))])
+
+        self.notification.refresh_from_db()
+        self.assertLessEqual(self.notification.opened_at, timezone.now())
+        self.assertGreaterEqual(self.notification.opened_at, before)
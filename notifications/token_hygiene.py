@@ -0,0 +1,152 @@
+"""
+Periodic FCM token hygiene.
+
+Dead tokens otherwise only surface one at a time as UnregisteredError during
+real sends. This validates active tokens in bulk with dry-run sends,
+deactivates tokens that haven't been refreshed in a long time and purges old
+inactive devices together with their delivery history in bounded batches.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from accounts.models import UserDevice
+from notification_backend.db_router import notification_databases
+from .models import NotificationDelivery
+from . import audiences, transport
+
+logger = logging.getLogger(__name__)
+
+# FCM allows at most 500 messages per send_each call
+FCM_MAX_BATCH = 500
+
+
+def invalid_token_errors(messaging):
+    """Errors that mean the token itself will never work again"""
+    from firebase_admin import exceptions
+    return (
+        messaging.UnregisteredError,
+        messaging.SenderIdMismatchError,
+        exceptions.InvalidArgumentError,
+    )
+
+
+def _deactivate(device_ids, window_days):
+    """Deactivate devices and return how many sends they consumed in the last window_days"""
+    if not device_ids:
+        return 0
+    recent_sends = sum(
+        NotificationDelivery.objects.using(alias).filter(
+            device_id__in=device_ids,
+            created_at__gte=timezone.now() - timedelta(days=window_days)
+        ).count()
+        for alias in notification_databases()
+    )
+    user_ids = set(
+        UserDevice.objects.filter(id__in=device_ids).values_list('user_id', flat=True)
+    )
+    UserDevice.objects.filter(id__in=device_ids).update(is_active=False, updated_at=timezone.now())
+    for user_id in user_ids:
+        audiences.sync_user_devices(user_id)
+    return recent_sends
+
+
+def validate_tokens(batch_size=FCM_MAX_BATCH, window_days=30):
+    """Dry-run a message to every active token and deactivate the invalid ones"""
+    if not transport.is_configured():
+        logger.warning("Firebase is not initialized, skipping token validation")
+        return {'checked': 0, 'invalid': 0, 'sends_saved': 0}
+
+    messaging = transport.get_messaging()
+    invalid_errors = invalid_token_errors(messaging)
+
+    batch_size = min(batch_size, FCM_MAX_BATCH)
+    checked = invalid = sends_saved = 0
+    devices = UserDevice.objects.filter(is_active=True).values_list('id', 'fcm_token').order_by('id')
+    last_id = 0
+
+    while True:
+        batch = list(devices.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+
+        response = messaging.send_each(
+            [messaging.Message(token=token, data={'type': 'token_check'}) for _, token in batch],
+            dry_run=True
+        )
+        invalid_ids = [
+            device_id
+            for (device_id, _), result in zip(batch, response.responses)
+            if not result.success and isinstance(result.exception, invalid_errors)
+        ]
+        sends_saved += _deactivate(invalid_ids, window_days)
+        checked += len(batch)
+        invalid += len(invalid_ids)
+
+    return {'checked': checked, 'invalid': invalid, 'sends_saved': sends_saved}
+
+
+def deactivate_stale_tokens(stale_days, window_days=30, batch_size=FCM_MAX_BATCH):
+    """Deactivate tokens that the app hasn't re-registered for stale_days"""
+    stale = UserDevice.objects.filter(
+        is_active=True,
+        updated_at__lt=timezone.now() - timedelta(days=stale_days)
+    ).values_list('id', flat=True)
+    deactivated = sends_saved = 0
+
+    while True:
+        device_ids = list(stale[:batch_size])
+        if not device_ids:
+            break
+        sends_saved += _deactivate(device_ids, window_days)
+        deactivated += len(device_ids)
+
+    return {'deactivated': deactivated, 'sends_saved': sends_saved}
+
+
+def purge_inactive_devices(purge_days, batch_size=1000):
+    """Delete long-inactive devices and their delivery history, batch_size rows per query"""
+    devices = UserDevice.objects.filter(
+        is_active=False,
+        updated_at__lt=timezone.now() - timedelta(days=purge_days)
+    ).values_list('id', flat=True)
+    purged_devices = purged_deliveries = 0
+
+    while True:
+        device_ids = list(devices[:batch_size])
+        if not device_ids:
+            break
+        # Delete history first so the device delete doesn't cascade into one huge statement
+        for alias in notification_databases():
+            deliveries = NotificationDelivery.objects.using(alias).filter(
+                device_id__in=device_ids
+            ).values_list('id', flat=True)
+            while True:
+                delivery_ids = list(deliveries[:batch_size])
+                if not delivery_ids:
+                    break
+                NotificationDelivery.objects.using(alias).filter(id__in=delivery_ids).delete()
+                purged_deliveries += len(delivery_ids)
+        UserDevice.objects.filter(id__in=device_ids).delete()
+        purged_devices += len(device_ids)
+
+    return {'devices': purged_devices, 'deliveries': purged_deliveries}
+
+
+def run(validate=True):
+    """Run every hygiene step with the configured thresholds and return a report"""
+    window_days = settings.DEVICE_TOKEN_STALE_DAYS
+    report = {}
+    if validate:
+        report['validation'] = validate_tokens(settings.DEVICE_HYGIENE_BATCH_SIZE, window_days)
+    report['stale'] = deactivate_stale_tokens(
+        settings.DEVICE_TOKEN_STALE_DAYS, window_days, settings.DEVICE_HYGIENE_BATCH_SIZE
+    )
+    report['purged'] = purge_inactive_devices(
+        settings.DEVICE_PURGE_AFTER_DAYS, settings.DEVICE_HYGIENE_BATCH_SIZE
+    )
+    report['sends_saved'] = report['stale']['sends_saved'] + report.get('validation', {}).get('sends_saved', 0)
+    return report
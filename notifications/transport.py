@@ -0,0 +1,54 @@
+"""
+Lazy Firebase Cloud Messaging transport.
+
+firebase_admin and its Google client dependencies are only imported, and
+the SDK only initialized, the first time a process actually sends. Web
+processes, which merely queue tasks, never pay for either.
+"""
+import logging
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_initialized = False
+
+
+def _initialize():
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if firebase_admin._apps:
+        return
+    if settings.FIREBASE_CREDENTIALS_PATH and Path(settings.FIREBASE_CREDENTIALS_PATH).exists():
+        try:
+            cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
+            firebase_admin.initialize_app(cred)
+            logger.info("Firebase Admin SDK initialized successfully")
+        except Exception as e:
+            logger.warning(f"Failed to initialize Firebase: {e}")
+    else:
+        logger.warning("Firebase credentials not configured or file not found")
+
+
+def get_messaging():
+    """Return the firebase_admin.messaging module, initializing the SDK on first use"""
+    global _initialized
+    if not _initialized:
+        with _lock:
+            if not _initialized:
+                _initialize()
+                _initialized = True
+
+    from firebase_admin import messaging
+    return messaging
+
+
+def is_configured():
+    """Whether a Firebase app is available for sending"""
+    get_messaging()
+    import firebase_admin
+    return bool(firebase_admin._apps)
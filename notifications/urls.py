@@ -1,16 +1,32 @@
+from django.conf import settings
 from django.urls import path
+from . import views
 from .views import (
     NotificationListView,
     UnreadNotificationListView,
     mark_notification_read,
-    mark_all_notifications_read,
-    unread_notification_count
+    batch_notification_action,
+    record_receipts,
+    NotificationPreferenceView,
+    mute_post
 )
 
+if settings.ASYNC_NOTIFICATION_VIEWS:
+    # Polling endpoints served by the async ORM when running under ASGI
+    from . import async_views as polling_views
+    notification_list = polling_views.notification_list
+else:
+    polling_views = views
+    notification_list = NotificationListView.as_view()
+
 urlpatterns = [
-    path('', NotificationListView.as_view(), name='notification-list'),
+    path('', notification_list, name='notification-list'),
     path('unread/', UnreadNotificationListView.as_view(), name='unread-notification-list'),
-    path('count/', unread_notification_count, name='unread-notification-count'),
+    path('count/', polling_views.unread_notification_count, name='unread-notification-count'),
     path('<int:notification_id>/read/', mark_notification_read, name='mark-notification-read'),
-    path('mark-all-read/', mark_all_notifications_read, name='mark-all-notifications-read'),
+    path('mark-all-read/', polling_views.mark_all_notifications_read, name='mark-all-notifications-read'),
+    path('batch/', batch_notification_action, name='batch-notification-action'),
+    path('receipts/', record_receipts, name='record-receipts'),
+    path('preferences/', NotificationPreferenceView.as_view(), name='notification-preferences'),
+    path('mute/<int:post_id>/', mute_post, name='mute-post'),
 ]
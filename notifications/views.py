@@ -1,33 +1,41 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
+from django.conf import settings
 from django.utils import timezone
 from drf_spectacular.utils import extend_schema
-from .models import Notification
-from .serializers import NotificationSerializer
+from notification_backend.db_router import ReadReplicaMixin, pin_to_primary, use_read_replica
+from posts.models import Post
+from . import receipts
+from .models import Notification, NotificationPreference, MutedPost
+from .serializers import (
+    NotificationSerializer,
+    NotificationBatchActionSerializer,
+    NotificationReceiptBatchSerializer,
+    NotificationPreferenceSerializer
+)
+import logging
+import redis
+
+logger = logging.getLogger(__name__)
 
 
 @extend_schema(responses={200: NotificationSerializer})
-class NotificationListView(generics.ListAPIView):
+class NotificationListView(ReadReplicaMixin, generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Notification.objects.filter(
-            recipient=self.request.user
-        ).select_related('sender')
+        return Notification.objects.for_recipient(self.request.user)
 
 
 @extend_schema(responses={200: NotificationSerializer})
-class UnreadNotificationListView(generics.ListAPIView):
+class UnreadNotificationListView(ReadReplicaMixin, generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Notification.objects.filter(
-            recipient=self.request.user,
-            is_read=False
-        ).select_related('sender')
+        return Notification.objects.for_recipient(self.request.user).filter(is_read=False)
 
 
 @extend_schema(
@@ -38,13 +46,11 @@ class UnreadNotificationListView(generics.ListAPIView):
 def mark_notification_read(request, notification_id):
     """Mark a specific notification as read"""
     try:
-        notification = Notification.objects.get(
-            id=notification_id,
-            recipient=request.user
-        )
+        notification = Notification.objects.for_recipient(request.user).get(id=notification_id)
         notification.is_read = True
         notification.read_at = timezone.now()
-        notification.save()
+        notification.save(update_fields=['is_read', 'read_at'])
+        pin_to_primary(request.user)
         
         return Response({"message": "Notification marked as read"}, status=status.HTTP_200_OK)
     except Notification.DoesNotExist:
@@ -61,10 +67,10 @@ def mark_notification_read(request, notification_id):
 @permission_classes([permissions.IsAuthenticated])
 def mark_all_notifications_read(request):
     """Mark all notifications as read for the current user"""
-    updated_count = Notification.objects.filter(
-        recipient=request.user,
+    updated_count = Notification.objects.for_recipient(request.user).filter(
         is_read=False
     ).update(is_read=True, read_at=timezone.now())
+    pin_to_primary(request.user)
     
     return Response(
         {"message": f"{updated_count} notifications marked as read"}, 
@@ -72,16 +78,102 @@ def mark_all_notifications_read(request):
     )
 
 
+@extend_schema(
+    request=NotificationBatchActionSerializer,
+    responses={200: {
+        "type": "object",
+        "properties": {
+            "requested": {"type": "integer"},
+            "updated": {"type": "integer"},
+            "unread_count": {"type": "integer"}
+        }
+    }}
+)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def batch_notification_action(request):
+    """Mark several notifications read or unread with a single UPDATE"""
+    serializer = NotificationBatchActionSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = set(serializer.validated_data['ids'])
+    
+    notifications = Notification.objects.for_recipient(request.user).filter(id__in=ids)
+    if serializer.validated_data['action'] == 'read':
+        updated_count = notifications.filter(is_read=False).update(
+            is_read=True,
+            read_at=timezone.now()
+        )
+    else:
+        updated_count = notifications.filter(is_read=True).update(is_read=False, read_at=None)
+    pin_to_primary(request.user)
+    
+    unread_count = Notification.objects.for_recipient(request.user).filter(is_read=False).count()
+    
+    return Response(
+        {"requested": len(ids), "updated": updated_count, "unread_count": unread_count},
+        status=status.HTTP_200_OK
+    )
+
+
+@extend_schema(
+    request=NotificationReceiptBatchSerializer,
+    responses={202: {"type": "object", "properties": {"message": {"type": "string"}}}}
+)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def record_receipts(request):
+    """Accept a batch of delivery receipt and open events, applied asynchronously in bulk"""
+    serializer = NotificationReceiptBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    events = serializer.validated_data['events']
+    
+    try:
+        receipts.enqueue(request.user.id, events, settings.NOTIFICATION_RECEIPTS_MAX_BUFFER)
+    except redis.RedisError as e:
+        logger.warning(f"Receipt buffer unavailable, applying directly: {e}")
+        receipts.apply([(request.user.id, event) for event in events])
+    
+    return Response({"message": f"{len(events)} events accepted"}, status=status.HTTP_202_ACCEPTED)
+
+
 @extend_schema(
     responses={200: {"type": "object", "properties": {"count": {"type": "integer"}}}}
 )
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@use_read_replica
 def unread_notification_count(request):
     """Get count of unread notifications"""
-    count = Notification.objects.filter(
-        recipient=request.user,
-        is_read=False
-    ).count()
+    count = Notification.objects.for_recipient(request.user).filter(is_read=False).count()
     
     return Response({"count": count}, status=status.HTTP_200_OK)
+
+
+@extend_schema(responses={200: NotificationPreferenceSerializer})
+class NotificationPreferenceView(generics.RetrieveUpdateAPIView):
+    serializer_class = NotificationPreferenceSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_object(self):
+        preference, created = NotificationPreference.objects.get_or_create(user=self.request.user)
+        return preference
+
+
+@extend_schema(
+    responses={200: {"type": "object", "properties": {"message": {"type": "string"}}}}
+)
+@api_view(['POST', 'DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+def mute_post(request, post_id):
+    """Mute (POST) or unmute (DELETE) notifications about a post"""
+    if request.method == 'DELETE':
+        MutedPost.objects.filter(user=request.user, post_id=post_id).delete()
+        return Response({"message": "Post unmuted"}, status=status.HTTP_200_OK)
+    
+    if not Post.objects.filter(id=post_id, is_active=True).exists():
+        return Response(
+            {"error": "Post not found"}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    MutedPost.objects.get_or_create(user=request.user, post_id=post_id)
+    return Response({"message": "Post muted"}, status=status.HTTP_200_OK)
@@ -1,15 +1,23 @@
 from django.contrib import admin
-from .models import Post, Comment
+from . import search
+from .models import Post, Comment, PostParticipant
 
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = ('id', 'author', 'content_preview', 'comments_count', 'created_at', 'is_active')
     list_filter = ('is_active', 'created_at')
-    search_fields = ('author__phone_number', 'content')
+    search_fields = ('author__phone_number__startswith',)
+    search_help_text = 'Words in the content (full-text index), or the start of the author phone number'
     readonly_fields = ('created_at', 'updated_at')
     list_per_page = 20
     
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term.strip():
+            results |= search.filter_queryset(queryset, search_term)
+        return results, may_have_duplicates
+    
     def content_preview(self, obj):
         return obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
     content_preview.short_description = 'Content Preview'
@@ -26,3 +34,11 @@ class CommentAdmin(admin.ModelAdmin):
     def content_preview(self, obj):
         return obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
     content_preview.short_description = 'Content Preview'
+
+
+@admin.register(PostParticipant)
+class PostParticipantAdmin(admin.ModelAdmin):
+    list_display = ('id', 'post_id', 'user', 'created_at')
+    raw_id_fields = ('post', 'user')
+    search_fields = ('user__phone_number',)
+    list_per_page = 20
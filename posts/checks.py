@@ -0,0 +1,22 @@
+from django.core.checks import Tags, Warning, register
+from django.db import connections, router
+
+from . import search
+from .models import Post
+
+
+@register(Tags.database)
+def check_search_index(app_configs, databases=None, **kwargs):
+    """Run with `manage.py check --database <alias>`"""
+    errors = []
+    for alias in databases or []:
+        if not router.allow_migrate_model(alias, Post):
+            continue
+        missing = search.missing_index(connections[alias])
+        if missing:
+            errors.append(Warning(
+                f"Post search index is incomplete on '{alias}' (missing {', '.join(missing)}).",
+                hint='Run `manage.py migrate`, which recreates it.',
+                id='posts.W001',
+            ))
+    return errors
@@ -0,0 +1,202 @@
+"""
+Shared post feed cache.
+
+Every user sees the same global feed, so the most recent active post IDs are
+kept in a Redis sorted set (scored by creation time) and each post's
+serialized representation is cached as a separate fragment. Fragments hold
+the author's id only; authors come from the profile cache (accounts.profiles)
+on read, so a profile edit shows up in the feed straight away. The first pages
+are served from Redis and the cache alone; signals keep the set and fragments
+in sync.
+"""
+import json
+import logging
+import uuid
+
+import redis
+from django.conf import settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from accounts import profiles
+from notification_backend.redis_client import get_redis
+from .models import Post
+from .serializers import PostSerializer
+
+logger = logging.getLogger(__name__)
+
+FEED_KEY = 'feed:posts'
+COUNT_KEY = 'feed:count'
+
+
+def _fragment_key(post_id):
+    # Renamed from feed:post:* when authors moved out of the fragments
+    return f'feed:fragment:{post_id}'
+
+
+def add_post(post, created=False):
+    """Insert (or refresh) a post in a warm feed and drop its stale fragment"""
+    if not settings.FEED_CACHE_ENABLED:
+        return
+    try:
+        client = get_redis()
+        feed_exists, count_exists = client.pipeline().exists(FEED_KEY).exists(COUNT_KEY).execute()
+        pipe = client.pipeline()
+        pipe.delete(_fragment_key(post.id))
+        # A cold feed is rebuilt from the database on the next read
+        if feed_exists:
+            pipe.zadd(FEED_KEY, {post.id: post.created_at.timestamp()})
+            pipe.zremrangebyrank(FEED_KEY, 0, -settings.FEED_CACHE_SIZE - 1)
+        if created and count_exists:
+            pipe.incr(COUNT_KEY)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Feed cache update failed for post {post.id}: {e}")
+
+
+def remove_post(post_id):
+    """Remove a deactivated or deleted post from the feed"""
+    if not settings.FEED_CACHE_ENABLED:
+        return
+    try:
+        get_redis().pipeline().zrem(FEED_KEY, post_id).delete(
+            _fragment_key(post_id), COUNT_KEY
+        ).execute()
+    except redis.RedisError as e:
+        logger.warning(f"Feed cache removal failed for post {post_id}: {e}")
+
+
+def invalidate_posts(post_ids):
+    """Drop cached fragments, e.g. when comment counts change"""
+    if not settings.FEED_CACHE_ENABLED or not post_ids:
+        return
+    try:
+        get_redis().delete(*[_fragment_key(post_id) for post_id in post_ids])
+    except redis.RedisError as e:
+        logger.warning(f"Feed cache invalidation failed: {e}")
+
+
+def _snapshot():
+    """({post_id: score} of the newest active posts, active post count) from the database"""
+    posts = Post.objects.filter(is_active=True).order_by('-created_at').values_list(
+        'id', 'created_at'
+    )[:settings.FEED_CACHE_SIZE]
+    count = Post.objects.filter(is_active=True).count()
+    return {post_id: created_at.timestamp() for post_id, created_at in posts}, count
+
+
+def _rebuild(client):
+    posts, count = _snapshot()
+    temp_key = f'{FEED_KEY}:rebuild:{uuid.uuid4().hex}'
+    pipe = client.pipeline()
+    if posts:
+        pipe.zadd(temp_key, posts)
+        pipe.rename(temp_key, FEED_KEY)
+        pipe.expire(FEED_KEY, settings.FEED_CACHE_TTL)
+    else:
+        pipe.delete(FEED_KEY)
+    pipe.set(COUNT_KEY, count, ex=settings.FEED_CACHE_TTL)
+    pipe.execute()
+
+    # A post committed while the snapshot was read had its add_post() skip the cold
+    # feed or land in the key the rename replaced; read again and reconcile
+    fresh, count = _snapshot()
+    pipe = client.pipeline()
+    if fresh:
+        pipe.zadd(FEED_KEY, fresh)
+        pipe.expire(FEED_KEY, settings.FEED_CACHE_TTL)
+    gone = posts.keys() - fresh.keys()
+    if gone:
+        pipe.zrem(FEED_KEY, *gone)
+    pipe.set(COUNT_KEY, count, ex=settings.FEED_CACHE_TTL)
+    pipe.execute()
+    return count
+
+
+def get_page(request, page_size):
+    """
+    Return the paginated feed response data for the requested page, or None if
+    the page is outside the cached window and must come from the database.
+    """
+    if not settings.FEED_CACHE_ENABLED:
+        return None
+
+    try:
+        page_number = int(request.query_params.get('page', 1))
+    except ValueError:
+        return None
+    if page_number < 1:
+        return None
+
+    start = (page_number - 1) * page_size
+    if start + page_size > settings.FEED_CACHE_SIZE:
+        return None
+
+    try:
+        client = get_redis()
+        count, cached_size = client.pipeline().get(COUNT_KEY).zcard(FEED_KEY).execute()
+        if not cached_size:
+            count = _rebuild(client)
+        elif count is None:
+            count = Post.objects.filter(is_active=True).count()
+            client.set(COUNT_KEY, count, ex=settings.FEED_CACHE_TTL)
+        else:
+            count = int(count)
+
+        if start >= count and page_number > 1:
+            return None
+        post_ids = [int(post_id) for post_id in client.zrevrange(FEED_KEY, start, start + page_size - 1)]
+        if len(post_ids) < page_size and start + len(post_ids) < count:
+            # Trimmed or partially invalidated window; let the database answer
+            return None
+        fragments = client.mget([_fragment_key(post_id) for post_id in post_ids]) if post_ids else []
+    except redis.RedisError as e:
+        logger.warning(f"Feed cache read failed: {e}")
+        return None
+
+    results = {
+        post_id: json.loads(fragment)
+        for post_id, fragment in zip(post_ids, fragments)
+        if fragment is not None
+    }
+    missing = [post_id for post_id in post_ids if post_id not in results]
+    if missing:
+        results.update(_fill_fragments(client, missing))
+    authors = profiles.get_profiles({fragment['author'] for fragment in results.values()}, request)
+
+    url = request.build_absolute_uri()
+    next_url = None
+    if start + page_size < count:
+        next_url = replace_query_param(url, 'page', page_number + 1)
+    previous_url = None
+    if page_number == 2:
+        previous_url = remove_query_param(url, 'page')
+    elif page_number > 2:
+        previous_url = replace_query_param(url, 'page', page_number - 1)
+
+    return {
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': [
+            {**results[post_id], 'author': authors[results[post_id]['author']]}
+            for post_id in post_ids
+            if post_id in results and results[post_id]['author'] in authors
+        ],
+    }
+
+
+def _fill_fragments(client, post_ids):
+    """Serialize and cache fragments for post_ids, with each author reduced to its id"""
+    posts = Post.objects.filter(id__in=post_ids, is_active=True).select_related('author')
+    fragments = {}
+    for post in posts:
+        data = PostSerializer(post).data
+        fragments[post.id] = {**data, 'author': data['author']['id']}
+    try:
+        pipe = client.pipeline()
+        for post_id, data in fragments.items():
+            pipe.set(_fragment_key(post_id), json.dumps(data, default=str), ex=settings.FEED_CACHE_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Feed cache fragment write failed: {e}")
+    return fragments
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_participants(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    PostParticipant = apps.get_model('posts', 'PostParticipant')
+    pairs = Comment.objects.order_by().values_list('post_id', 'author_id').distinct()
+    batch = []
+    for post_id, user_id in pairs.iterator(chunk_size=2000):
+        batch.append(PostParticipant(post_id=post_id, user_id=user_id))
+        if len(batch) >= 2000:
+            PostParticipant.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    PostParticipant.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='posts.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('post', 'user')},
+            },
+        ),
+        migrations.RunPython(backfill_participants, migrations.RunPython.noop),
+    ]
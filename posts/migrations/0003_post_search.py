@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:52
+
+from django.db import migrations
+
+# PostgreSQL: the database keeps the generated tsvector in sync with content
+POSTGRES_FORWARD = [
+    "ALTER TABLE posts_post ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', content)) STORED",
+    'CREATE INDEX posts_post_search_idx ON posts_post USING GIN (search_vector)',
+]
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS posts_post_search_idx',
+    'ALTER TABLE posts_post DROP COLUMN IF EXISTS search_vector',
+]
+
+# SQLite: an FTS5 index over posts_post.content maintained by triggers. Note that
+# migrations which make SQLite rebuild posts_post drop these triggers with the old table.
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    "content, content='posts_post', content_rowid='id', tokenize='porter unicode61')",
+    'CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN '
+    'INSERT INTO posts_post_fts(rowid, content) VALUES (new.id, new.content); END',
+    'CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN '
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    'CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF content ON posts_post BEGIN '
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    'INSERT INTO posts_post_fts(rowid, content) VALUES (new.id, new.content); END',
+    "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TABLE IF EXISTS posts_post_fts',
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_post_participants'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
@@ -34,3 +34,16 @@ class Comment(models.Model):
         
     def __str__(self):
         return f"{self.author.phone_number} on {self.post.id} - {self.content[:30]}"
+
+
+class PostParticipant(models.Model):
+    """Users who commented on a post, kept up to date as comments are created"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='participants')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('post', 'user')
+        
+    def __str__(self):
+        return f"{self.user_id} in {self.post_id}"
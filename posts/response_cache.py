@@ -0,0 +1,84 @@
+"""
+Cached responses for post detail and comment list pages.
+
+Representations are stored with the author reduced to its id; authors are
+filled in from the profile cache (accounts.profiles) on the way out, so a
+profile edit drops one entry instead of every post and comment page that
+embeds it. A post's comment pages share a generation token that any comment
+change replaces; old pages are never read again and expire on their own.
+"""
+import uuid
+
+from accounts import profiles
+from notification_backend import cache
+
+
+def _post_key(post_id):
+    return f'posts:detail:{post_id}'
+
+
+def _generation_key(post_id):
+    return f'posts:comments-generation:{post_id}'
+
+
+def _page_key(post_id, generation, page):
+    return f'posts:comments:{post_id}:{generation}:{page}'
+
+
+def _without_authors(items):
+    """Copies of items with author replaced by its id; the profiles are cached on the side"""
+    profiles.store({item['author']['id']: item['author'] for item in items})
+    return [{**item, 'author': item['author']['id']} for item in items]
+
+
+def _with_authors(items, request):
+    """Inverse of _without_authors, or None if an author no longer exists"""
+    authors = profiles.get_profiles({item['author'] for item in items}, request)
+    if not authors.keys() >= {item['author'] for item in items}:
+        return None
+    return [{**item, 'author': authors[item['author']]} for item in items]
+
+
+def get_post(post_id, request):
+    """Cached PostSerializer data for a post, or None"""
+    cached = cache.get_many([_post_key(post_id)]).get(_post_key(post_id))
+    if cached is None:
+        return None
+    post = _with_authors([cached], request)
+    return post[0] if post else None
+
+
+def set_post(data):
+    cache.set_many({_post_key(data['id']): _without_authors([data])[0]})
+
+
+def comments_generation(post_id):
+    """Current generation token of a post's comment pages, or None if caching is unavailable"""
+    return cache.get_or_set(_generation_key(post_id), lambda: uuid.uuid4().hex)
+
+
+def get_comment_page(post_id, generation, page, request):
+    """Cached paginated CommentListView data, or None"""
+    key = _page_key(post_id, generation, page)
+    cached = cache.get_many([key]).get(key)
+    if cached is None:
+        return None
+    results = _with_authors(cached['results'], request)
+    if results is None:
+        return None
+    return {**cached, 'results': results}
+
+
+def set_comment_page(post_id, generation, page, data):
+    cache.set_many({
+        _page_key(post_id, generation, page): {**data, 'results': _without_authors(data['results'])}
+    })
+
+
+def invalidate_post(post_id):
+    cache.delete_many([_post_key(post_id)])
+
+
+def invalidate_comments(post_id):
+    """Drop every cached comment page of the post (and its comments_count in the detail)"""
+    cache.delete_many([_generation_key(post_id), _post_key(post_id)])
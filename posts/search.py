@@ -0,0 +1,217 @@
+"""
+Full-text search over post content.
+
+PostgreSQL uses a stored generated tsvector column (search_vector) with a GIN
+index; SQLite uses an external-content FTS5 table kept up to date by
+triggers. Both are created by migration 0003_post_search and maintained by
+the database itself on every insert, update and delete. Results are ranked
+(ts_rank / bm25) and paged with a (rank, id) keyset cursor, so later pages
+cost the same as the first.
+
+SQLite drops the triggers whenever a migration rebuilds posts_post, so
+ensure_index() recreates anything missing after every migrate. Other
+databases have no index and fall back to an unranked substring match,
+newest first, with the same cursor.
+"""
+import base64
+import json
+import re
+
+from django.db import connections, router
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+TABLE = Post._meta.db_table
+FTS_TABLE = f'{TABLE}_fts'
+TEXT_SEARCH_CONFIG = 'english'
+MIGRATION = ('posts', '0003_post_search')
+
+# Index objects from migration 0003 by name, with idempotent statements recreating them
+_INDEX_OBJECTS = {
+    'postgresql': {
+        'search_vector': (
+            f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}', content)) STORED"
+        ),
+        f'{TABLE}_search_idx': f'CREATE INDEX IF NOT EXISTS {TABLE}_search_idx ON {TABLE} USING GIN (search_vector)',
+    },
+    'sqlite': {
+        FTS_TABLE: (
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"content, content='{TABLE}', content_rowid='id', tokenize='porter unicode61')"
+        ),
+        f'{FTS_TABLE}_insert': (
+            f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {TABLE} BEGIN '
+            f'INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content); END'
+        ),
+        f'{FTS_TABLE}_delete': (
+            f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {TABLE} BEGIN '
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content); END"
+        ),
+        f'{FTS_TABLE}_update': (
+            f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF content ON {TABLE} BEGIN '
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content); "
+            f'INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content); END'
+        ),
+    },
+}
+_EXISTING_OBJECTS_SQL = {
+    'postgresql': """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'search_vector'
+        UNION ALL
+        SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s
+    """,
+    'sqlite': "SELECT name FROM sqlite_master WHERE tbl_name IN (%s, %s)",
+}
+
+_MATCH_SQL = {
+    'postgresql': f"SELECT id FROM {TABLE} WHERE search_vector @@ websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', %s)",
+    'sqlite': f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+}
+
+# Higher ts_rank is better; lower bm25 is better
+_RANKED_SQL = {
+    'postgresql': f"""
+        SELECT id, rank FROM (
+            SELECT id, ts_rank(search_vector, query)::float8 AS rank
+            FROM {TABLE}, websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', %s) AS query
+            WHERE search_vector @@ query AND is_active
+        ) AS matches
+        {{after}}
+        ORDER BY rank DESC, id DESC
+        LIMIT %s
+    """,
+    'sqlite': f"""
+        SELECT id, rank FROM (
+            SELECT post.id AS id, bm25({FTS_TABLE}) AS rank
+            FROM {FTS_TABLE} JOIN {TABLE} AS post ON post.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s AND post.is_active
+        )
+        {{after}}
+        ORDER BY rank, id DESC
+        LIMIT %s
+    """,
+}
+_AFTER_SQL = {
+    'postgresql': ('WHERE (rank, id) < (%s, %s)', lambda rank, post_id: [rank, post_id]),
+    'sqlite': ('WHERE rank > %s OR (rank = %s AND id < %s)', lambda rank, post_id: [rank, rank, post_id]),
+}
+
+
+def _vendor(using):
+    """The database vendor if it has a search index, else None"""
+    vendor = connections[using].vendor
+    return vendor if vendor in _MATCH_SQL else None
+
+
+def missing_index(connection):
+    """Names of search index objects that migration 0003 created but the database lacks"""
+    vendor = connection.vendor
+    if vendor not in _INDEX_OBJECTS or TABLE not in connection.introspection.table_names():
+        return []
+    if MIGRATION not in MigrationRecorder(connection).applied_migrations():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(_EXISTING_OBJECTS_SQL[vendor], [TABLE, FTS_TABLE if vendor == 'sqlite' else TABLE])
+        existing = {name for name, in cursor.fetchall()}
+    return [name for name in _INDEX_OBJECTS[vendor] if name not in existing]
+
+
+def ensure_index(connection):
+    """Recreate missing search index objects (and reindex); return the names recreated"""
+    missing = missing_index(connection)
+    if missing:
+        with connection.cursor() as cursor:
+            for name in missing:
+                cursor.execute(_INDEX_OBJECTS[connection.vendor][name])
+            if connection.vendor == 'sqlite':
+                # Posts written while the triggers were gone are missing from the index
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return missing
+
+
+def _search_param(vendor, query):
+    """Query parameter for the backend, or None if nothing searchable is left"""
+    if vendor == 'sqlite':
+        # Quote every word so user input can't be parsed as FTS5 query syntax; terms are ANDed
+        terms = re.findall(r'\w+', query)
+        return ' '.join(f'"{term}"' for term in terms) or None
+    return query.strip() or None
+
+
+def encode_cursor(rank, post_id):
+    return base64.urlsafe_b64encode(json.dumps([rank, post_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the (rank, post_id) encoded in a cursor, raising ValueError if it is malformed"""
+    try:
+        rank, post_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(rank, (int, float)) or not isinstance(post_id, int):
+        raise ValueError('Invalid cursor')
+    return rank, post_id
+
+
+def search(query, after=None, limit=20):
+    """
+    Return (active posts best match first, cursor for the next page or None).
+    after is a decoded cursor from a previous page.
+    """
+    using = router.db_for_read(Post)
+    vendor = _vendor(using)
+    if vendor is None:
+        return _search_unindexed(query, after, limit, using)
+    param = _search_param(vendor, query)
+    if param is None:
+        return [], None
+
+    after_sql, params = '', [param]
+    if after is not None:
+        after_sql, after_params = _AFTER_SQL[vendor]
+        params.extend(after_params(*after))
+    with connections[using].cursor() as cursor:
+        cursor.execute(_RANKED_SQL[vendor].format(after=after_sql), [*params, limit + 1])
+        rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_id, last_rank = rows[-1]
+        next_cursor = encode_cursor(last_rank, last_id)
+    posts = Post.objects.using(using).select_related('author').in_bulk([post_id for post_id, _ in rows])
+    return [posts[post_id] for post_id, _ in rows if post_id in posts], next_cursor
+
+
+def _search_unindexed(query, after, limit, using):
+    """search() without an index: posts containing every word, newest first (rank is always 0)"""
+    posts = filter_queryset(Post.objects.using(using).filter(is_active=True), query)
+    if after is not None:
+        posts = posts.filter(id__lt=after[1])
+    posts = list(posts.select_related('author').order_by('-id')[:limit + 1])
+
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor(0, posts[-1].id)
+    return posts, next_cursor
+
+
+def filter_queryset(queryset, query):
+    """Narrow a Post queryset (active or not) to posts matching query, using the index where there is one"""
+    vendor = _vendor(queryset.db)
+    if vendor is None:
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            queryset = queryset.filter(content__icontains=term)
+        return queryset
+    param = _search_param(vendor, query)
+    if param is None:
+        return queryset.none()
+    return queryset.filter(id__in=RawSQL(_MATCH_SQL[vendor], [param]))
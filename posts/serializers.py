@@ -1,10 +1,11 @@
 from rest_framework import serializers
+from . import search
 from .models import Post, Comment
-from accounts.serializers import UserProfileSerializer
+from accounts.serializers import UserSummarySerializer
 
 
 class PostSerializer(serializers.ModelSerializer):
-    author = UserProfileSerializer(read_only=True)
+    author = UserSummarySerializer(read_only=True)
     comments_count = serializers.ReadOnlyField()
     
     class Meta:
@@ -28,7 +29,7 @@ class PostCreateSerializer(serializers.ModelSerializer):
 
 
 class CommentSerializer(serializers.ModelSerializer):
-    author = UserProfileSerializer(read_only=True)
+    author = UserSummarySerializer(read_only=True)
     
     class Meta:
         model = Comment
@@ -48,3 +49,14 @@ class CommentCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
         return super().create(validated_data)
+
+
+class PostSearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    cursor = serializers.CharField(required=False)
+    
+    def validate_cursor(self, value):
+        try:
+            return search.decode_cursor(value)
+        except ValueError:
+            raise serializers.ValidationError('Invalid cursor.')
@@ -0,0 +1,45 @@
+import logging
+
+from django.db import connections, router, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from . import feed, response_cache, search
+from .models import Post, Comment
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Post)
+def update_feed_on_post_save(sender, instance, created, **kwargs):
+    transaction.on_commit(lambda: response_cache.invalidate_post(instance.id))
+    if instance.is_active:
+        transaction.on_commit(lambda: feed.add_post(instance, created=created))
+    else:
+        transaction.on_commit(lambda: feed.remove_post(instance.id))
+
+
+@receiver(post_delete, sender=Post)
+def update_feed_on_post_delete(sender, instance, **kwargs):
+    # Deleted instances lose their pk, so bind it now
+    post_id = instance.id
+    transaction.on_commit(lambda: feed.remove_post(post_id))
+    transaction.on_commit(lambda: response_cache.invalidate_comments(post_id))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_feed_on_comment_change(sender, instance, **kwargs):
+    # The cached fragment and post detail embed comments_count
+    transaction.on_commit(lambda: feed.invalidate_posts([instance.post_id]))
+    transaction.on_commit(lambda: response_cache.invalidate_comments(instance.post_id))
+
+
+@receiver(post_migrate)
+def ensure_search_index(sender, using, **kwargs):
+    # SQLite loses the FTS triggers whenever a migration rebuilds posts_post
+    if sender.name != 'posts' or not router.allow_migrate_model(using, Post):
+        return
+    recreated = search.ensure_index(connections[using])
+    if recreated:
+        logger.warning(f"Recreated post search index objects on {using}: {', '.join(recreated)}")
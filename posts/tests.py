@@ -1 +1,63 @@
-# posts/tests.py
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from accounts.models import User
+from . import search
+from .models import Post
+
+
+class PostSearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(phone_number='+15550100001', password='password')
+
+    def _post(self, content, **kwargs):
+        return Post.objects.create(author=self.author, content=content, **kwargs)
+
+    def _page_through(self, query, limit):
+        """Follow cursors (through their encoded form, like a client) and return every page's post IDs"""
+        pages, after = [], None
+        while True:
+            posts, next_cursor = search.search(query, after=after, limit=limit)
+            pages.append([post.id for post in posts])
+            if next_cursor is None:
+                return pages
+            after = search.decode_cursor(next_cursor)
+
+    def test_equal_ranks_page_without_gaps_or_repeats(self):
+        posts = [self._post('Concert tickets for sale') for _ in range(3)]
+        self._post('Nothing to see here')
+
+        pages = self._page_through('concert tickets', limit=2)
+
+        self.assertEqual(pages, [[posts[2].id, posts[1].id], [posts[0].id]])
+
+    def test_inactive_posts_are_not_found(self):
+        active = self._post('Garden party on Sunday')
+        self._post('Garden party cancelled', is_active=False)
+
+        posts, next_cursor = search.search('garden party')
+
+        self.assertEqual([post.id for post in posts], [active.id])
+        self.assertIsNone(next_cursor)
+
+    def test_query_without_words_finds_nothing(self):
+        self._post('Anything at all')
+
+        self.assertEqual(search.search('!!! ***'), ([], None))
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ('not-a-cursor', search.encode_cursor('0.5', 1), search.encode_cursor(0.5, '1')):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                search.decode_cursor(cursor)
+
+    @skipUnless(connection.vendor == 'postgresql', 'ts_rank ranking is PostgreSQL-only')
+    def test_postgres_equal_ranks_page_one_post_at_a_time(self):
+        # ts_rank returns float4; the cursor's rank has to compare equal to the rank
+        # recomputed for the next page, or the tied posts after it are skipped
+        posts = [self._post('Lost cat near the station') for _ in range(3)]
+
+        pages = self._page_through('lost cat', limit=1)
+
+        self.assertEqual(pages, [[posts[2].id], [posts[1].id], [posts[0].id]])
@@ -0,0 +1,102 @@
+"""
+Redis-backed limits for endpoints that trigger notification fan-out.
+
+Both the request rate throttles and the per-user fan-out budget use one
+sliding-window log per user: a sorted set of "<id>:<cost>" members scored by
+time, trimmed and summed atomically in Lua. If Redis is unavailable requests
+are let through rather than failing.
+"""
+import logging
+import time
+import uuid
+
+import redis
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from notification_backend.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] window key; ARGV: now_ms, window_ms, limit, cost, member.
+# Returns {allowed, wait_ms}. The first entry in an empty window is always
+# allowed so a single cost above the limit can't block a user forever.
+_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+
+local used = 0
+for _, member in ipairs(redis.call('ZRANGE', KEYS[1], 0, -1)) do
+    used = used + tonumber(string.match(member, ':(%d+)$'))
+end
+
+if used > 0 and used + tonumber(ARGV[4]) > tonumber(ARGV[3]) then
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    return {0, tonumber(oldest[2]) + window - now}
+end
+
+redis.call('ZADD', KEYS[1], now, ARGV[5])
+redis.call('PEXPIRE', KEYS[1], window)
+return {1, 0}
+"""
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60), in the same format as DRF's DEFAULT_THROTTLE_RATES"""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def consume(key, limit, window_seconds, cost=1):
+    """Record cost against key's sliding window; return (allowed, seconds to wait)"""
+    try:
+        allowed, wait_ms = get_redis().eval(
+            _WINDOW_SCRIPT, 1, key,
+            int(time.time() * 1000), window_seconds * 1000, limit, int(cost), f'{uuid.uuid4().hex}:{int(cost)}'
+        )
+    except redis.RedisError as e:
+        logger.warning(f"Throttle store unavailable, allowing request: {e}")
+        return True, None
+    return bool(allowed), (wait_ms / 1000 if not allowed else None)
+
+
+class SlidingWindowUserThrottle(BaseThrottle):
+    """Per-user request rate limit for the view's scope in DEFAULT_THROTTLE_RATES"""
+    scope = None
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        if not request.user.is_authenticated:
+            return True
+        limit, window = parse_rate(api_settings.DEFAULT_THROTTLE_RATES[self.scope])
+        allowed, self.wait_seconds = consume(f'throttle:{self.scope}:{request.user.pk}', limit, window)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class PostCreateThrottle(SlidingWindowUserThrottle):
+    scope = 'post_create'
+
+
+class CommentCreateThrottle(SlidingWindowUserThrottle):
+    scope = 'comment_create'
+
+
+def charge_fanout(user, recipients):
+    """
+    Charge a fan-out of this many recipients to the user's hourly budget,
+    raising Throttled when it is used up. Like the other limits this fails
+    open, including when the recipient count is unknown (None).
+    """
+    if recipients is None:
+        return
+    allowed, wait = consume(f'throttle:fanout:{user.pk}', settings.NOTIFICATION_FANOUT_BUDGET, 3600, recipients)
+    if not allowed:
+        raise Throttled(wait=wait, detail='Notification fan-out budget exceeded.')
@@ -3,6 +3,7 @@ from .views import (
     PostCreateView,
     PostListView,
     PostDetailView,
+    PostSearchView,
     CommentCreateView,
     CommentListView,
     CommentDetailView
@@ -12,6 +13,7 @@ urlpatterns = [
     # Posts
     path('posts/', PostListView.as_view(), name='post-list'),
     path('posts/create/', PostCreateView.as_view(), name='post-create'),
+    path('posts/search/', PostSearchView.as_view(), name='post-search'),
     path('posts/<int:id>/', PostDetailView.as_view(), name='post-detail'),
     
     # Comments
@@ -1,13 +1,20 @@
+from django.db import transaction
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 from drf_spectacular.utils import extend_schema
-from .models import Post, Comment
+from . import feed, response_cache, search, throttles
+from .models import Post, Comment, PostParticipant
 from .serializers import (
     PostSerializer,
     PostCreateSerializer,
     CommentSerializer,
-    CommentCreateSerializer
+    CommentCreateSerializer,
+    PostSearchQuerySerializer
 )
+from notification_backend.db_router import ReadReplicaMixin, pin_to_primary, replica_reads
+from notifications import audiences
 from notifications.tasks import send_post_notification, send_comment_notification
 
 
@@ -18,11 +25,17 @@ from notifications.tasks import send_post_notification, send_comment_notificatio
 class PostCreateView(generics.CreateAPIView):
     serializer_class = PostCreateSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [throttles.PostCreateThrottle]
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        post = serializer.save()
+        with transaction.atomic():
+            post = serializer.save()
+            # Every post notifies the whole audience; an exhausted budget rolls the post back
+            throttles.charge_fanout(request.user, audiences.audience_size(audiences.ALL))
+        pin_to_primary(request.user)
+        audiences.touch_user(request.user.id)
         
         # Send push notification to all users
         send_post_notification.delay(post.id)
@@ -33,12 +46,52 @@ class PostCreateView(generics.CreateAPIView):
 
 
 @extend_schema(responses={200: PostSerializer})
-class PostListView(generics.ListAPIView):
+class PostListView(ReadReplicaMixin, generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
         return Post.objects.filter(is_active=True).select_related('author')
+    
+    def list(self, request, *args, **kwargs):
+        # First pages of the shared feed are served from the Redis feed cache
+        data = feed.get_page(request, self.paginator.page_size)
+        if data is not None:
+            return Response(data)
+        return super().list(request, *args, **kwargs)
+
+
+@extend_schema(
+    parameters=[PostSearchQuerySerializer],
+    responses={200: {
+        "type": "object",
+        "properties": {
+            "next": {"type": "string", "nullable": True},
+            "results": {"type": "array", "items": {"$ref": "#/components/schemas/Post"}}
+        }
+    }}
+)
+class PostSearchView(generics.GenericAPIView):
+    """Full-text search over active posts, best match first, paged with an opaque cursor"""
+    serializer_class = PostSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, *args, **kwargs):
+        params = PostSearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        
+        with replica_reads(request.user):
+            posts, next_cursor = search.search(
+                params.validated_data['q'],
+                after=params.validated_data.get('cursor'),
+                limit=api_settings.PAGE_SIZE
+            )
+            results = self.get_serializer(posts, many=True).data
+        
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({'next': next_url, 'results': results})
 
 
 @extend_schema(responses={200: PostSerializer})
@@ -49,6 +102,13 @@ class PostDetailView(generics.RetrieveAPIView):
     
     def get_queryset(self):
         return Post.objects.filter(is_active=True).select_related('author')
+    
+    def retrieve(self, request, *args, **kwargs):
+        data = response_cache.get_post(self.kwargs['id'], request)
+        if data is None:
+            data = self.get_serializer(self.get_object()).data
+            response_cache.set_post(data)
+        return Response(data)
 
 
 @extend_schema(
@@ -58,15 +118,29 @@ class PostDetailView(generics.RetrieveAPIView):
 class CommentCreateView(generics.CreateAPIView):
     serializer_class = CommentCreateSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [throttles.CommentCreateThrottle]
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        comment = serializer.save()
+        with transaction.atomic():
+            comment = serializer.save()
+            # The post author plus every other participant of the thread
+            throttles.charge_fanout(
+                request.user,
+                PostParticipant.objects.filter(post_id=comment.post_id).count() + 1
+            )
+        pin_to_primary(request.user)
+        audiences.touch_user(request.user.id)
+        
+        # Track the commenter as a thread participant (no-op if already one)
+        PostParticipant.objects.bulk_create(
+            [PostParticipant(post_id=comment.post_id, user=request.user)],
+            ignore_conflicts=True
+        )
         
-        # Send push notification to post author (if not the same user)
-        if comment.post.author != comment.author:
-            send_comment_notification.delay(comment.id)
+        # Notify the post author and the other participants
+        send_comment_notification.delay(comment.id)
         
         # Return detailed comment data
         response_serializer = CommentSerializer(comment, context={'request': request})
@@ -74,7 +148,7 @@ class CommentCreateView(generics.CreateAPIView):
 
 
 @extend_schema(responses={200: CommentSerializer})
-class CommentListView(generics.ListAPIView):
+class CommentListView(ReadReplicaMixin, generics.ListAPIView):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -84,6 +158,22 @@ class CommentListView(generics.ListAPIView):
             post_id=post_id,
             is_active=True
         ).select_related('author', 'post')
+    
+    def list(self, request, *args, **kwargs):
+        post_id = self.kwargs.get('post_id')
+        page = request.query_params.get(self.paginator.page_query_param, '1')
+        generation = response_cache.comments_generation(post_id) if page.isdigit() else None
+        if generation is None:
+            return super().list(request, *args, **kwargs)
+        
+        data = response_cache.get_comment_page(post_id, generation, page, request)
+        if data is not None:
+            return Response(data)
+        
+        # Fill the shared cache from the primary so replica lag can't get cached
+        response = super(ReadReplicaMixin, self).list(request, *args, **kwargs)
+        response_cache.set_comment_page(post_id, generation, page, response.data)
+        return response
 
 
 @extend_schema(responses={200: CommentSerializer})